@@ -0,0 +1,112 @@
+import os
+import time
+from math import isqrt
+from typing import List, Tuple, Union
+import numpy as np
+
+# Precomputed table of all energy levels E ~ n_x^2 + n_y^2 + n_z^2 up to a bound.
+#
+# The number of ordered pairs (n_y, n_z) per value of n_y^2 + n_z^2 comes from
+# np.add.outer on the squares and np.unique(..., return_counts=True); adding
+# every n_x^2 to that pair histogram gives the number of ordered triples per
+# coefficient, which is exactly its degeneracy. The sorted non-zero entries are
+# the levels, so after building (or loading the cached .npz) the n-th level and
+# its degeneracy are array lookups, and ranges of levels are slices.
+
+CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'energy_levels.npz')
+
+def count_triples(limit: int) -> np.ndarray:
+    # counts[s] = number of ordered triples of positive integers with n_x^2 + n_y^2 + n_z^2 == s, s <= limit
+    squares = np.arange(1, isqrt(limit) + 1, dtype=np.int64)**2
+    pairs = np.add.outer(squares, squares).ravel()
+    values, pair_counts = np.unique(pairs[pairs <= limit], return_counts=True)
+    by_value = np.zeros(limit + 1, dtype=np.int64)
+    by_value[values] = pair_counts
+    counts = np.zeros(limit + 1, dtype=np.int64)
+    for square in squares:
+        counts[square:] += by_value[:limit + 1 - square]
+    return counts
+
+class LevelTable:
+    def __init__(self, coefficients: np.ndarray, degeneracies: np.ndarray, limit: int):
+        self.coefficients = coefficients
+        self.degeneracies = degeneracies
+        self.limit = limit  # every level with coefficient <= limit is in the table
+
+    def __len__(self) -> int:
+        return len(self.coefficients)
+
+    @classmethod
+    def build(cls, levels: int) -> 'LevelTable':
+        # about 5 in 6 integers are a sum of three positive squares, grow the bound until there are enough
+        limit = int(1.25 * levels) + 16
+        while True:
+            counts = count_triples(limit)
+            coefficients = np.flatnonzero(counts)
+            if len(coefficients) >= levels:
+                return cls(coefficients, counts[coefficients], limit)
+            limit = int(1.25 * limit)
+
+    @classmethod
+    def load(cls, levels: int, path: str = CACHE) -> 'LevelTable':
+        # the cached table if it has at least `levels` levels, otherwise build it and update the cache
+        if os.path.exists(path):
+            with np.load(path) as data:
+                table = cls(data['coefficients'], data['degeneracies'], int(data['limit']))
+            if len(table) >= levels:
+                return table
+        table = cls.build(levels)
+        table.save(path)
+        return table
+
+    def save(self, path: str = CACHE) -> None:
+        np.savez(path, coefficients=self.coefficients, degeneracies=self.degeneracies, limit=self.limit)
+
+    def _check(self, n: int) -> None:
+        if not 1 <= n <= len(self):
+            raise ValueError(f"level {n} is not in the table, which has levels 1 to {len(self)}")
+
+    def find_degeneracy(self, n: int) -> int:
+        # degeneracy of the n-th energy level (1-based)
+        self._check(n)
+        return int(self.degeneracies[n - 1])
+
+    def find_energy_level(self, n: int) -> int:
+        self._check(n)
+        return int(self.coefficients[n - 1])
+
+    def find_energy_level_and_combinations(self, n: int) -> Union[Tuple[int, int, List[Tuple[int, int, int]]], Tuple[None, None, None]]:
+        # same result as main_opt.find_energy_level_and_combinations, the combinations
+        # solved for from the coefficient (sorted triples n_x <= n_y <= n_z)
+        if not 1 <= n <= len(self):
+            return None, None, None
+        coefficient = self.find_energy_level(n)
+        return coefficient, self.find_degeneracy(n), combinations(coefficient)
+
+    def levels(self, start: int, stop: int) -> Tuple[np.ndarray, np.ndarray]:
+        # coefficients and degeneracies of the levels start..stop (1-based, inclusive)
+        self._check(start)
+        self._check(stop)
+        if stop < start:
+            raise ValueError(f"empty range of levels {start} to {stop}")
+        return self.coefficients[start - 1:stop], self.degeneracies[start - 1:stop]
+
+def combinations(coefficient: int) -> List[Tuple[int, int, int]]:
+    # all n_x <= n_y <= n_z with n_x^2 + n_y^2 + n_z^2 == coefficient, in lexicographic order
+    root = isqrt(coefficient)
+    n_x, n_y = np.meshgrid(np.arange(1, root + 1), np.arange(1, root + 1), indexing='ij')
+    n_x, n_y = n_x.ravel(), n_y.ravel()
+    rest = coefficient - n_x**2 - n_y**2
+    n_z = np.sqrt(np.maximum(rest, 0)).round().astype(np.int64)
+    found = (n_x <= n_y) & (n_y <= n_z) & (n_z**2 == rest)
+    return [(int(x), int(y), int(z)) for x, y, z in zip(n_x[found], n_y[found], n_z[found])]
+
+if __name__ == "__main__":
+    start_time = time.time()
+    table = LevelTable.load(10**6)
+    print(f"[INFO]: {len(table)} levels up to {table.limit} in {time.time() - start_time:.2f} seconds")
+    for n in (1, 10, 100, 10**5):
+        coefficient, degeneracy, found = table.find_energy_level_and_combinations(n)
+        print(f"E_{n}: coefficient={coefficient}, degeneracy={degeneracy}, {len(found)} combinations, first {found[0]}")
+    coefficients, degeneracies = table.levels(1, 10)
+    print(f"levels 1-10: coefficients={coefficients.tolist()}, degeneracies={degeneracies.tolist()}")
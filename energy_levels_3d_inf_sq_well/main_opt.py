@@ -1,7 +1,8 @@
 import time
 from collections import defaultdict
 import heapq
-from typing import List, Tuple, Union, Dict
+from itertools import islice
+from typing import Iterator, List, Tuple, Union, Dict
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 def original_find_energy_level_and_combinations(n):
@@ -62,7 +63,7 @@ def optimized_find_energy_level_and_combinations_python_gpt(n):
 
 from degeneracy import find_degeneracy
 
-def find_energy_level_and_combinations(n: int) -> Union[Tuple[int, int, List[Tuple[int, int, int]]], Tuple[None, None, None]]:
+def triple_loop_find_energy_level_and_combinations(n: int) -> Union[Tuple[int, int, List[Tuple[int, int, int]]], Tuple[None, None, None]]:
     coefficients = defaultdict(list)
     
     # Efficient calculation of all combinations for the given n
@@ -87,6 +88,34 @@ def find_energy_level_and_combinations(n: int) -> Union[Tuple[int, int, List[Tup
     else:
         return None, None, None
 
+def energy_levels() -> Iterator[Tuple[int, List[Tuple[int, int, int]]]]:
+    # Yields (coefficient, combinations) of the distinct values of n_x^2 + n_y^2 + n_z^2
+    # in increasing order, the combinations as sorted triples n_x <= n_y <= n_z.
+    # The heap is the frontier of the sorted triples: every triple is pushed by exactly
+    # one parent, (a, b, c - 1) if c > b, (a, b - 1, c - 1) if c == b > a and
+    # (a - 1, a - 1, a - 1) if a == b == c, so it only ever holds O(coefficient) triples.
+    heap = [(3, 1, 1, 1)]
+    while True:
+        coefficient = heap[0][0]
+        combinations = []
+        while heap[0][0] == coefficient:
+            _, a, b, c = heapq.heappop(heap)
+            combinations.append((a, b, c))
+            heapq.heappush(heap, (a*a + b*b + (c + 1)**2, a, b, c + 1))
+            if b == c:
+                heapq.heappush(heap, (a*a + 2*(b + 1)**2, a, b + 1, c + 1))
+                if a == b:
+                    heapq.heappush(heap, (3*(a + 1)**2, a + 1, b + 1, c + 1))
+        yield coefficient, combinations
+
+def find_energy_level_and_combinations(n: int) -> Union[Tuple[int, int, List[Tuple[int, int, int]]], Tuple[None, None, None]]:
+    # The n-th energy level (1-based) from the enumerator, without building all n^3 triples
+    if n < 1:
+        return None, None, None
+    coefficient, combinations = next(islice(energy_levels(), n - 1, None))
+    degeneracy = find_degeneracy(combinations)
+    return coefficient, degeneracy, combinations
+
 # # Example usage
 # n = 500  # Find the 200th energy level
 
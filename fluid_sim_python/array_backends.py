@@ -0,0 +1,163 @@
+import numpy as np
+from fft_backends import NumpyFFT
+
+"""
+Array namespace shim for the spectral fluid solver
+
+The solver (workspace.py, solver.py) is written once against the handful of
+operations below; the backends map them onto NumPy or torch (CPU or CUDA).
+Arithmetic on the arrays themselves (+=, *=, ...) works the same for both
+and is used directly.
+
+    asarray(a)             numpy array -> backend array (floats/complex in the working precision)
+    to_numpy(a)            backend array -> numpy array
+    empty(shape, complex)  uninitialised real / complex array
+    rfft2, irfft2          real FFTs over the last two axes, with out=
+    rfft3, irfft3          real FFTs over the last three axes (3D solver)
+    multiply, negative, reciprocal, abs, exp   elementwise with out=
+    max(a)                 largest element as a python float
+    is_array, is_complex
+    synchronize()          wait for queued device work (for timing)
+"""
+
+class NumpyBackend:
+    """ NumPy arrays, FFTs by one of the fft_backends """
+    name = 'numpy'
+
+    def __init__(self, fft=None, dtype=np.float64):
+        self.fft = NumpyFFT() if fft is None else fft
+        self.real_dtype = np.dtype(dtype)
+        self.complex_dtype = np.result_type(self.real_dtype, np.complex64)
+
+    def asarray(self, a):
+        a = np.asarray(a)
+        dtype = {'f': self.real_dtype, 'c': self.complex_dtype}.get(a.dtype.kind, a.dtype)
+        return a.astype(dtype, copy=False)
+
+    def to_numpy(self, a):
+        return np.asarray(a)
+
+    def empty(self, shape, complex=False):
+        return np.empty(shape, dtype=self.complex_dtype if complex else self.real_dtype)
+
+    # new arrays are cast to the working precision, np.fft < 2 always returns complex128/float64
+
+    def rfft2(self, a, out=None):
+        return self.fft.rfft2(a, out=out) if out is not None else self.asarray(self.fft.rfft2(a))
+
+    def irfft2(self, a_hat, s, out=None):
+        return self.fft.irfft2(a_hat, s, out=out) if out is not None else self.asarray(self.fft.irfft2(a_hat, s))
+
+    def rfft3(self, a, out=None):
+        return self.fft.rfft3(a, out=out) if out is not None else self.asarray(self.fft.rfft3(a))
+
+    def irfft3(self, a_hat, s, out=None):
+        return self.fft.irfft3(a_hat, s, out=out) if out is not None else self.asarray(self.fft.irfft3(a_hat, s))
+
+    def multiply(self, a, b, out):
+        return np.multiply(a, b, out=out)
+
+    def negative(self, a, out):
+        return np.negative(a, out=out)
+
+    def reciprocal(self, a, out):
+        return np.reciprocal(a, out=out)
+
+    def abs(self, a, out):
+        return np.abs(a, out=out)
+
+    def exp(self, a, out):
+        return np.exp(a, out=out)
+
+    def max(self, a):
+        return float(a.max())
+
+    def is_array(self, a):
+        return isinstance(a, np.ndarray)
+
+    def is_complex(self, a):
+        return np.iscomplexobj(a)
+
+    def synchronize(self):
+        pass
+
+    def close(self):
+        self.fft.close()
+
+class TorchBackend:
+    """ torch tensors on `device` (default: cuda if available, else cpu) """
+    name = 'torch'
+
+    def __init__(self, device=None, dtype=np.float32):
+        import torch
+        import torch.fft
+        self.torch = torch
+        self.device = torch.device(device or ('cuda' if torch.cuda.is_available() else 'cpu'))
+        self.real_dtype = getattr(torch, np.dtype(dtype).name)
+        self.complex_dtype = torch.complex64 if self.real_dtype == torch.float32 else torch.complex128
+
+    def asarray(self, a):
+        a = np.asarray(a)
+        dtype = {'f': self.real_dtype, 'c': self.complex_dtype}.get(a.dtype.kind)
+        return self.torch.as_tensor(a, dtype=dtype, device=self.device)
+
+    def to_numpy(self, a):
+        return a.cpu().numpy()
+
+    def empty(self, shape, complex=False):
+        return self.torch.empty(shape, dtype=self.complex_dtype if complex else self.real_dtype, device=self.device)
+
+    def rfft2(self, a, out=None):
+        return self.torch.fft.rfft2(a, out=out)
+
+    def irfft2(self, a_hat, s, out=None):
+        return self.torch.fft.irfft2(a_hat, s=tuple(s), out=out)
+
+    def rfft3(self, a, out=None):
+        return self.torch.fft.rfftn(a, dim=(-3, -2, -1), out=out)
+
+    def irfft3(self, a_hat, s, out=None):
+        return self.torch.fft.irfftn(a_hat, s=tuple(s), dim=(-3, -2, -1), out=out)
+
+    def multiply(self, a, b, out):
+        return self.torch.mul(a, b, out=out)
+
+    def negative(self, a, out):
+        return self.torch.neg(a, out=out)
+
+    def reciprocal(self, a, out):
+        return self.torch.reciprocal(a, out=out)
+
+    def abs(self, a, out):
+        return self.torch.abs(a, out=out)
+
+    def exp(self, a, out):
+        return self.torch.exp(a, out=out)
+
+    def max(self, a):
+        return float(a.max())
+
+    def is_array(self, a):
+        return isinstance(a, self.torch.Tensor)
+
+    def is_complex(self, a):
+        return a.is_complex()
+
+    def synchronize(self):
+        if self.device.type == 'cuda':
+            self.torch.cuda.synchronize()
+
+    def close(self):
+        pass
+
+ARRAY_BACKENDS = ('numpy', 'torch')
+PRECISIONS = ('float32', 'float64')
+
+def get_array_backend(name='numpy', fft=None, device=None, dtype=None):
+    """ return an array backend by name; `fft` only applies to numpy, `device` only to torch,
+    `dtype` is the real working precision (default float64 for numpy, float32 for torch) """
+    if name == 'numpy':
+        return NumpyBackend(fft=fft, dtype=dtype or np.float64)
+    if name == 'torch':
+        return TorchBackend(device=device, dtype=dtype or np.float32)
+    raise ValueError(f"unknown array backend '{name}', choose from {ARRAY_BACKENDS}")
@@ -0,0 +1,224 @@
+import argparse
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+import numpy as np
+from array_backends import ARRAY_BACKENDS, PRECISIONS, get_array_backend
+from fft_backends import FFT_BACKENDS, get_fft_backend
+from integrators import INTEGRATORS, get_integrator
+from solver import fourier_grid, initial_condition
+from workspace import SpectralWorkspace
+
+"""
+Benchmark of the fluid solver: every operator and full timesteps, for each 
+array backend and resolution N
+
+    python benchmark.py --N 64 128 256 512 1024 2048 --json bench.json
+    python benchmark.py --backends numpy --fft pyfftw --compare bench.json
+
+Per operator/step it reports ns per grid point, the share of the time spent 
+in FFTs, steps per second, and per N the memory held by the solver plus the 
+peak of what a step allocates on top of it (numpy, and torch on CUDA). 
+--json stores everything with the versions it ran on, --compare prints the 
+speed relative to such a file to track regressions. torch runs on --device 
+(cuda if available); backends that are not installed are skipped.
+"""
+
+OPERATORS = ('grad', 'div', 'curl', 'poisson_solve', 'diffusion_solve', 'apply_dealias')
+STEPS = ('physical_step',) + tuple(f'step:{name}' for name in INTEGRATORS)
+
+class FFTTimer:
+    """ array backend wrapper adding up the time spent in rfft2/irfft2 """
+
+    def __init__(self, xp):
+        self.xp = xp
+        self.seconds = 0.0
+
+    def __getattr__(self, name):
+        return getattr(self.xp, name)
+
+    def rfft2(self, a, out=None):
+        self.xp.synchronize()
+        tic = time.perf_counter()
+        out = self.xp.rfft2(a, out=out)
+        self.xp.synchronize()
+        self.seconds += time.perf_counter() - tic
+        return out
+
+    def irfft2(self, a_hat, s, out=None):
+        self.xp.synchronize()
+        tic = time.perf_counter()
+        out = self.xp.irfft2(a_hat, s, out=out)
+        self.xp.synchronize()
+        self.seconds += time.perf_counter() - tic
+        return out
+
+def setup(xp, N, batch=None, spectral=True):
+    """ return (ws, vx, vy, vx_hat, vy_hat) of the vortex initial condition on an N x N grid """
+    L = 1
+    xlin = np.linspace(0, L, num=N+1)[0:N]
+    xx, yy = np.meshgrid(xlin, xlin)
+    vx, vy = initial_condition(xx, yy)
+    if batch is not None:
+        vx, vy = np.stack([vx]*batch), np.stack([vy]*batch)
+    kx, ky, kSq, kSq_inv, dealias = fourier_grid(N, L)
+    ws = SpectralWorkspace(kx, ky, kSq, kSq_inv, dealias, xp=xp, spectral=spectral, batch=batch)
+    vx, vy = xp.asarray(vx), xp.asarray(vy)
+    return ws, vx, vy, xp.rfft2(vx), xp.rfft2(vy)
+
+def operator_calls(xp, N, batch=None, dt=0.001, nu=0.001):
+    """ return ({name: call}, resident arrays) of every operator and timestep """
+    ws, vx, vy, vx_hat, vy_hat = setup(xp, N, batch)
+    pws, pvx, pvy = setup(xp, N, batch, spectral=False)[:3]
+    out_x, out_y = xp.empty(ws.field_shape), xp.empty(ws.field_shape)
+    calls = {
+        'grad':            lambda: ws.grad(vx, out_x, out_y),
+        'div':             lambda: ws.div(vx, vy, out_x),
+        'curl':            lambda: ws.curl(vx, vy, out_x),
+        'poisson_solve':   lambda: ws.poisson_solve(vx, out_x),
+        'diffusion_solve': lambda: ws.diffusion_solve(vx, dt, nu, out_x),
+        'apply_dealias':   lambda: ws.apply_dealias(vx, out_x),
+        'physical_step':   lambda: pws.physical_step(pvx, pvy, dt, nu),
+    }
+    arrays = [vx, vy, vx_hat, vy_hat, out_x, out_y]
+    for name in INTEGRATORS:
+        integrator = get_integrator(name, ws)
+        calls[f'step:{name}'] = lambda integrator=integrator: integrator.step(vx_hat, vy_hat, dt, nu)
+        arrays += integrator.arrays()
+    return calls, ws, pws, arrays
+
+def time_call(xp, call, min_time=0.2, fft=None):
+    """ return (seconds per call, calls, FFT share) of call(), repeated for at least min_time """
+    call()  # warm up (plans, caches)
+    n = 1
+    while True:
+        if fft is not None:
+            fft.seconds = 0.0
+        xp.synchronize()
+        tic = time.perf_counter()
+        for i in range(n):
+            call()
+        xp.synchronize()
+        seconds = time.perf_counter() - tic
+        if seconds >= min_time:
+            return seconds / n, n, (fft.seconds / seconds if fft is not None else None)
+        n *= 2 if seconds == 0 else max(2, int(np.ceil(1.2 * min_time / seconds)))
+
+def transient_peak(xp, call):
+    """ return the peak bytes call() allocates on top of what is already held, or None """
+    if xp.name == 'numpy':
+        tracemalloc.start()
+        call()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+    if xp.name == 'torch' and xp.device.type == 'cuda':
+        xp.torch.cuda.synchronize()
+        held = xp.torch.cuda.memory_allocated()
+        xp.torch.cuda.reset_peak_memory_stats()
+        call()
+        xp.torch.cuda.synchronize()
+        return xp.torch.cuda.max_memory_allocated() - held
+    return None
+
+def benchmark(xp, N, names, batch=None, min_time=0.2):
+    """ return (results, memory) of the operators/steps `names` on an N x N grid """
+    timer = FFTTimer(xp)
+    calls, ws, pws, arrays = operator_calls(timer, N, batch)
+    points = N * N * (batch or 1)
+    results = []
+    for name in names:
+        seconds, n, fft_share = time_call(xp, calls[name], min_time=min_time, fft=timer)
+        results.append({
+            'name': name,
+            'N': N,
+            'batch': batch,
+            'calls': n,
+            'seconds': seconds,
+            'ns_per_point': seconds / points * 1e9,
+            'fft_share': fft_share,
+            'steps_per_s': (batch or 1) / seconds if name in STEPS else None,
+        })
+    memory = {
+        'N': N,
+        'resident_bytes': ws.nbytes + pws.nbytes + sum(a.nbytes for a in arrays),
+        'spectral_step_transient_bytes': transient_peak(xp, calls['step:euler']),
+        'physical_step_transient_bytes': transient_peak(xp, calls['physical_step']),
+    }
+    return results, memory
+
+def environment(backend):
+    """ return the versions the benchmark ran with """
+    env = {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+           'processor': platform.processor(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    try:
+        env['git'] = subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                                    check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        env['git'] = None
+    if backend == 'torch':
+        import torch
+        env['torch'] = torch.__version__
+    return env
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="fluid solver operator and timestep benchmark")
+    parser.add_argument('--backends', nargs='+', choices=ARRAY_BACKENDS, default=list(ARRAY_BACKENDS))
+    parser.add_argument('--device', help="torch device (default: cuda if available)")
+    parser.add_argument('--fft', choices=sorted(FFT_BACKENDS), default='numpy', help="FFT backend of numpy")
+    parser.add_argument('--precision', choices=PRECISIONS, help="working precision (default: float64 for numpy, float32 for torch)")
+    parser.add_argument('--N', type=int, nargs='+', default=[64, 128, 256, 512, 1024, 2048])
+    parser.add_argument('--ops', nargs='+', choices=OPERATORS + STEPS, default=list(OPERATORS + STEPS))
+    parser.add_argument('--batch', type=int, default=None, help="ensemble members per call")
+    parser.add_argument('--min-time', type=float, default=0.2, help="seconds each operator is repeated for")
+    parser.add_argument('--json', help="write the results to this JSON file")
+    parser.add_argument('--compare', help="JSON file of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.compare is not None:
+        with open(args.compare) as f:
+            for run in json.load(f)['runs']:
+                for r in run['results']:
+                    baseline[(run['backend'], r['N'], r['name'])] = r['seconds']
+
+    runs = []
+    print(f"{'backend':>12} {'N':>6} {'operator':>16} {'ns/point':>10} {'FFT':>5} {'steps/s':>9}" +
+          (f" {'vs old':>7}" if baseline else ""))
+    for name in args.backends:
+        try:
+            fft = get_fft_backend(args.fft) if name == 'numpy' else None
+            xp = get_array_backend(name, fft=fft, device=args.device, dtype=args.precision)
+        except ImportError as e:
+            print(f"[INFO]: skipping {name}: {e}")
+            continue
+        label = (name if name == 'numpy' else f"{name}-{xp.device}") + ("" if args.precision is None else f"-{args.precision}")
+        run = {'backend': label, 'fft': args.fft if name == 'numpy' else name, 'environment': environment(name),
+               'results': [], 'memory': []}
+        for N in args.N:
+            results, memory = benchmark(xp, N, args.ops, batch=args.batch, min_time=args.min_time)
+            for r in results:
+                steps = "" if r['steps_per_s'] is None else f"{r['steps_per_s']:.1f}"
+                old = baseline.get((label, N, r['name']))
+                ratio = "-" if old is None else f"{old / r['seconds']:.2f}x"
+                vs = f" {ratio:>7}" if baseline else ""
+                print(f"{label:>12} {N:>6} {r['name']:>16} {r['ns_per_point']:>10.1f} {r['fft_share']:>5.0%} {steps:>9}{vs}")
+            MB = 1024**2
+            transient = [memory[k] for k in ('spectral_step_transient_bytes', 'physical_step_transient_bytes')]
+            transient = " / ".join("n/a" if b is None else f"{b/MB:.1f} MB" for b in transient)
+            print(f"[INFO]: N = {N}: {memory['resident_bytes']/MB:.1f} MB held, peak allocated by a spectral / physical step {transient}")
+            run['results'] += results
+            run['memory'].append(memory)
+        runs.append(run)
+        xp.close()
+
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump({'runs': runs}, f, indent=2)
+
+    return 0
+
+if __name__ == "__main__":
+    main()
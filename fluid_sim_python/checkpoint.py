@@ -0,0 +1,29 @@
+import json
+import os
+import numpy as np
+
+"""
+Checkpoint/restart for the fluid simulations
+
+A checkpoint is a single uncompressed .npz holding the solver state arrays
+(vx, vy or their spectra) plus a JSON `meta` entry with t, the step index,
+the number of frames written and the simulation parameters. It is written
+to a temporary file, fsync'ed and renamed over the previous checkpoint, so
+a crash or preemption mid-write never leaves a corrupt checkpoint behind.
+"""
+
+def save_checkpoint(path, arrays, meta):
+    """ atomically write the state `arrays` ({name: ndarray}) and `meta` (JSON-able dict) to `path` """
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def load_checkpoint(path):
+    """ return (arrays, meta) as written by save_checkpoint """
+    with np.load(path) as data:
+        meta = json.loads(str(data['meta']))
+        arrays = {name: data[name] for name in data.files if name != 'meta'}
+    return arrays, meta
@@ -0,0 +1,85 @@
+import argparse
+import numpy as np
+from array_backends import get_array_backend
+from integrators import INTEGRATORS, get_integrator
+from solver import fourier_grid
+from workspace import SpectralWorkspace
+
+"""
+Convergence of the time integrators against the Taylor-Green vortex
+
+    python convergence.py --N 32 --tEnd 0.5 --dt 0.02 0.01 0.005 0.0025
+
+The vortex is advected by a uniform flow (U, V), which makes the nonlinear 
+term non-trivial while keeping the analytic solution (the vortex decays as 
+exp(-2 nu k^2 t) and moves with (U, V)). For every integrator the error at 
+tEnd is printed per dt together with the observed order, and the number of 
+steps each needs to reach the --tol error.
+"""
+
+def taylor_green(xx, yy, t, nu, U=1.0, V=0.5, k=2*np.pi):
+    """ return the exact (vx, vy) of the advected Taylor-Green vortex at time t """
+    x, y = xx - U*t, yy - V*t
+    decay = np.exp(-2 * nu * k**2 * t)
+    vx = U + np.sin(k*x) * np.cos(k*y) * decay
+    vy = V - np.cos(k*x) * np.sin(k*y) * decay
+    return vx, vy
+
+def error(integrator, N, tEnd, dt, nu, xp=None):
+    """ return the max velocity error at tEnd of `integrator` with timestep dt """
+    xp = get_array_backend('numpy') if xp is None else xp
+    L = 1
+    xlin = np.linspace(0, L, num=N+1)[0:N]
+    xx, yy = np.meshgrid(xlin, xlin)
+    kx, ky, kSq, kSq_inv, dealias = fourier_grid(N, L)
+    ws = SpectralWorkspace(kx, ky, kSq, kSq_inv, dealias, xp=xp)
+    stepper = get_integrator(integrator, ws)
+
+    vx, vy = taylor_green(xx, yy, 0, nu)
+    vx_hat, vy_hat = xp.rfft2(xp.asarray(vx)), xp.rfft2(xp.asarray(vy))
+    Nt = int(round(tEnd/dt))
+    for i in range(Nt):
+        stepper.step(vx_hat, vy_hat, dt, nu)
+
+    vx_exact, vy_exact = taylor_green(xx, yy, Nt*dt, nu)
+    vx = xp.to_numpy(xp.irfft2(vx_hat, ws.shape))
+    vy = xp.to_numpy(xp.irfft2(vy_hat, ws.shape))
+    return max(np.abs(vx - vx_exact).max(), np.abs(vy - vy_exact).max())
+
+def steps_for_tolerance(dts, errors, tEnd, tol):
+    """ return the steps needed for an error of tol, interpolated log-log between 
+    the dts (extrapolated with the order of the nearest pair outside of them) """
+    logdt, logerr = np.log(dts), np.log(errors)
+    j = np.clip(np.searchsorted(-logerr, -np.log(tol)), 1, len(dts) - 1)
+    order = (logerr[j-1] - logerr[j]) / (logdt[j-1] - logdt[j])
+    dt = np.exp(logdt[j] + (np.log(tol) - logerr[j]) / order)
+    return int(np.ceil(tEnd / dt))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="time integrator convergence on the advected Taylor-Green vortex")
+    parser.add_argument('--integrators', nargs='+', choices=sorted(INTEGRATORS), default=list(INTEGRATORS))
+    parser.add_argument('--N', type=int, default=32)
+    parser.add_argument('--tEnd', type=float, default=0.5)
+    parser.add_argument('--nu', type=float, default=0.01)
+    parser.add_argument('--dt', type=float, nargs='+', default=[0.05, 0.025, 0.0125, 0.00625, 0.003125])
+    parser.add_argument('--tol', type=float, default=1e-3, help="error at which the steps needed are compared")
+    args = parser.parse_args(argv)
+
+    dts = np.array(sorted(args.dt, reverse=True))
+    steps = {}
+    for name in args.integrators:
+        errors = np.array([error(name, args.N, args.tEnd, dt, args.nu) for dt in dts])
+        print(f"[INFO]: {name}")
+        for j, (dt, err) in enumerate(zip(dts, errors)):
+            order = "" if j == 0 else f"   order {np.log(errors[j-1]/err) / np.log(dts[j-1]/dt):.2f}"
+            print(f"    dt = {dt:<10g} error = {err:.3e}{order}")
+        steps[name] = steps_for_tolerance(dts, errors, args.tEnd, args.tol)
+
+    print(f"[INFO]: steps (rhs evaluations) for an error of {args.tol:g} at t = {args.tEnd:g}")
+    for name, n in steps.items():
+        print(f"    {name:<6} {n} ({n * INTEGRATORS[name].stages})")
+
+    return 0
+
+if __name__ == "__main__":
+    main()
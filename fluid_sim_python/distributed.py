@@ -0,0 +1,223 @@
+import argparse
+import json
+import time
+import numpy as np
+from array_backends import NumpyBackend
+from fft_backends import _NUMPY_FFT_OUT
+from frame_writer import count_frames, open_frame_writer
+from integrators import INTEGRATORS, get_integrator
+from solver import DEFAULTS, INITIAL_CONDITIONS, fourier_grid, initial_condition
+from timestep import AdaptiveTimestep, format_stats, output_times
+from workspace import SpectralWorkspace
+
+"""
+Slab decomposed, multi-process spectral solver (mpi4py)
+
+    mpirun -n 4 python distributed.py --N 1024 --tEnd 1 --output fields.npy
+
+Each of the P ranks holds N/P rows of every real space field and a slab of 
+ceil((N/2+1)/P) kx columns of every spectrum, so a rank needs 1/P of the 
+memory of the serial solver. The 2D FFTs are 1D FFTs along the local axis 
+with an MPI Alltoall transposing the slabs in between. Transforming single 
+rows/columns gives the same bits as numpy's rfft2, so the frames are 
+identical to those of cpu.py; everything else (SpectralWorkspace, the 
+integrators, adaptive dt) is the serial code running on the local slabs.
+
+--bench STEPS only times STEPS timesteps, scaling.py runs it for several 
+numbers of ranks.
+"""
+
+def _into(fft, a, out, **kwargs):
+    """ fft(a, **kwargs) into out, also for numpy < 2 whose FFTs have no out= """
+    if _NUMPY_FFT_OUT:
+        return fft(a, out=out, **kwargs)
+    out[...] = fft(a, **kwargs)
+    return out
+
+class SlabBackend(NumpyBackend):
+    """ numpy backend whose rfft2/irfft2 map row slabs of the N x N grid to kx 
+    column slabs of the half spectrum (and back) across the ranks of `comm` """
+    name = 'slab'
+
+    def __init__(self, comm, N, dtype=np.float64):
+        from mpi4py import MPI
+        super().__init__(dtype=dtype)
+        P = comm.size
+        if N % P != 0:
+            raise ValueError(f"N = {N} has to be divisible by the number of ranks ({P})")
+        self.MPI = MPI
+        self.comm = comm
+        self.N = N
+        self.Nk = N//2 + 1
+        self.rows = N // P            # real space rows per rank
+        self.cols = -(-self.Nk // P)  # spectral columns per rank, the last slabs are zero padded
+        self.row_slice = slice(comm.rank * self.rows, (comm.rank + 1) * self.rows)
+        self.col_slice = slice(min(comm.rank * self.cols, self.Nk), min((comm.rank + 1) * self.cols, self.Nk))
+        self.comm_seconds = 0.0       # time spent in Alltoall
+
+        # transpose buffers: the row slab's spectrum along x, padded to P*cols 
+        # columns, and the (P, rows, cols) blocks exchanged with every rank
+        self._rows_hat = np.zeros((self.rows, P * self.cols), dtype=self.complex_dtype)
+        self._send = np.empty((P, self.rows, self.cols), dtype=self.complex_dtype)
+        self._recv = np.empty((P, self.rows, self.cols), dtype=self.complex_dtype)
+
+    def pad(self, a):
+        """ return the kx column slab `a` (N, <= cols) zero padded to (N, cols) """
+        return np.pad(a, ((0, 0), (0, self.cols - a.shape[-1])))
+
+    def _alltoall(self):
+        tic = time.perf_counter()
+        self.comm.Alltoall(self._send, self._recv)
+        self.comm_seconds += time.perf_counter() - tic
+
+    def rfft2(self, a, out=None):
+        """ (rows, N) real slab -> (N, cols) spectrum slab """
+        if out is None:
+            out = self.empty((self.N, self.cols), complex=True)
+        P = self.comm.size
+        _into(np.fft.rfft, a, self._rows_hat[:, :self.Nk], axis=-1)
+        self._send[...] = self._rows_hat.reshape(self.rows, P, self.cols).transpose(1, 0, 2)
+        self._alltoall()
+        return _into(np.fft.fft, self._recv.reshape(self.N, self.cols), out, axis=0)
+
+    def irfft2(self, a_hat, s, out=None):
+        """ (N, cols) spectrum slab -> (rows, N) real slab """
+        if out is None:
+            out = self.empty((self.rows, self.N))
+        P = self.comm.size
+        _into(np.fft.ifft, a_hat, self._send.reshape(self.N, self.cols), axis=0)
+        self._alltoall()
+        self._rows_hat.reshape(self.rows, P, self.cols)[...] = self._recv.transpose(1, 0, 2)
+        return _into(np.fft.irfft, self._rows_hat[:, :self.Nk], out, n=self.N, axis=-1)
+
+    def max(self, a):
+        return self.comm.allreduce(float(a.max()), op=self.MPI.MAX)
+
+    def synchronize(self):
+        self.comm.Barrier()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="slab decomposed Navier-Stokes spectral simulation, run with mpirun")
+    parser.add_argument('--N', type=int, default=DEFAULTS['N'])
+    parser.add_argument('--tEnd', type=float, default=DEFAULTS['tEnd'])
+    parser.add_argument('--dt', type=float, default=DEFAULTS['dt'])
+    parser.add_argument('--tOut', type=float, default=DEFAULTS['tOut'])
+    parser.add_argument('--nu', type=float, default=DEFAULTS['nu'])
+    parser.add_argument('--ic', choices=INITIAL_CONDITIONS, default=DEFAULTS['ic'])
+    parser.add_argument('--integrator', choices=sorted(INTEGRATORS), default=DEFAULTS['integrator'])
+    parser.add_argument('--cfl', type=float, help="adaptive timestep at this CFL number, still hitting every tOut")
+    parser.add_argument('--dtMin', type=float, default=DEFAULTS['dtMin'])
+    parser.add_argument('--dtMax', type=float)
+    parser.add_argument('--headless', action='store_true', help="no progress output")
+    parser.add_argument('--output', default='navier-stokes-spectral-animation.mp4', help="vorticity frames, .mp4, .npy or .h5")
+    parser.add_argument('--bench', type=int, metavar='STEPS', help="only time STEPS timesteps, print them as JSON")
+    return parser.parse_args(argv)
+
+def main(argv=None, comm=None):
+    """ Navier-Stokes Simulation, on the ranks of `comm` (default: MPI.COMM_WORLD) """
+    args = parse_args(argv)
+    if comm is None:
+        from mpi4py import MPI
+        comm = MPI.COMM_WORLD
+    root = comm.rank == 0
+    
+    # Simulation parameters
+    N    = args.N
+    t    = 0
+    tEnd = args.tEnd
+    dt   = args.dt
+    tOut = args.tOut
+    nu   = args.nu
+    adaptive = args.cfl is not None
+    xp = SlabBackend(comm, N)
+    
+    # Domain [0,1] x [0,1], this rank's rows
+    L = 1
+    xlin = np.linspace(0,L, num=N+1)  # Note: x=0 & x=1 are the same point!
+    xlin = xlin[0:N]                  # chop off periodic point
+    xx, yy = np.meshgrid(xlin, xlin[xp.row_slice])
+    vx, vy = initial_condition(xx, yy, args.ic)
+    
+    # Fourier Space Variables, this rank's kx columns
+    kx, ky, kSq, kSq_inv, dealias = (xp.pad(a) for a in fourier_grid(N, L, cols=xp.col_slice))
+    
+    ws = SpectralWorkspace(kx, ky, kSq, kSq_inv, dealias, xp=xp, rows=xp.rows)
+    integrator = get_integrator(args.integrator, ws)
+    vx_hat = xp.rfft2(xp.asarray(vx))
+    vy_hat = xp.rfft2(xp.asarray(vy))
+    if root:
+        print(ws.memory_report(state=(vx_hat, vy_hat) + integrator.arrays()) + f" per rank, {comm.size} ranks")
+    
+    if args.bench is not None:
+        integrator.step(vx_hat, vy_hat, dt, nu)  # warm up
+        xp.synchronize()
+        xp.comm_seconds = 0.0
+        tic = time.perf_counter()
+        for i in range(args.bench):
+            integrator.step(vx_hat, vy_hat, dt, nu)
+        xp.synchronize()
+        seconds = time.perf_counter() - tic
+        comm_seconds = comm.allreduce(xp.comm_seconds, op=xp.MPI.MAX)
+        if root:
+            print(json.dumps({'ranks': comm.size, 'N': N, 'integrator': args.integrator, 'steps': args.bench,
+                              'seconds': seconds, 'steps_per_s': args.bench / seconds,
+                              'alltoall_share': comm_seconds / seconds}))
+        return 0
+    
+    # number of timesteps (with --cfl the steps are sized to land on every output time instead)
+    Nt = int(np.ceil(tEnd/dt))
+    if adaptive:
+        tFrames, onSchedule = output_times(tEnd, tOut)
+        stepper = AdaptiveTimestep(args.cfl, kmax=np.pi*N/L, dt=dt, dt_min=args.dtMin or 0, dt_max=args.dtMax or tOut)
+    
+    # frames are gathered on rank 0 and streamed to disk from there
+    n_frames = len(tFrames) if adaptive else count_frames(Nt, dt, tOut)
+    writer = open_frame_writer(args.output, (N, N), n_frames=n_frames, scale=max(1, 960//N)) if root else None
+    frame = np.empty((N, N), dtype=ws.wz.dtype) if root else None
+    t0 = t
+    tic = time.perf_counter()
+    
+    # Main Loop
+    i = 0
+    iOut = 0
+    while (t < tFrames[-1]) if adaptive else (i < Nt):
+
+        if adaptive:
+            tNext = tFrames[iOut]
+            ws.spectral_rhs( vx_hat, vy_hat )
+            dt = stepper.next_dt( ws.max_speed(), t, tNext )
+            integrator.step( vx_hat, vy_hat, dt, nu, rhs_ready=True )
+        else:
+            integrator.step( vx_hat, vy_hat, dt, nu )
+        i += 1
+        
+        # update time
+        if adaptive and dt == tNext - t:
+            t = tNext  # exactly on the output time
+        else:
+            t += dt
+        
+        # write frames for animation
+        if adaptive:
+            output = t == tNext
+        else:
+            output = t + dt > (iOut + 1) * tOut or i == Nt
+        if output:
+            # vorticity (for plotting), every rank's rows gathered on rank 0
+            ws.curl_hat( vx_hat, vy_hat, out=ws.wz )
+            comm.Gather(ws.wz, frame, root=0)
+            iOut += 1
+            if root:
+                writer.write(frame)
+                if not args.headless:
+                    print(f"[INFO]: t = {t:.4f}, frame {iOut}")
+    
+    if root:
+        writer.close()
+        if adaptive:
+            print(format_stats(stepper.stats(t0, t, args.dt, time.perf_counter() - tic), args.dt))
+
+    return 0
+
+if __name__ == "__main__":
+    main()
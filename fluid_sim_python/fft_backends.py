@@ -0,0 +1,194 @@
+import os
+import pickle
+import numpy as np
+
+"""
+FFT backends for the spectral fluid solvers
+
+All backends expose the same real-to-complex transforms over the last two
+(three) axes, so the operators in workspace.py do not care who does the work:
+
+    rfft2(a, out=None)         real (..., N, N) -> half spectrum (..., N, N//2+1)
+    irfft2(a_hat, s, out=None) half spectrum -> real field of shape s
+    rfft3, irfft3              the same over the last three axes (3D solver)
+
+If `out` is given the result is written into it instead of a new array.
+
+numpy   np.fft, single threaded, no planning (the default)
+scipy   scipy.fft with a workers= thread count
+pyfftw  FFTW plans cached per shape/dtype on pre-aligned buffers, with the
+        planner wisdom optionally persisted to disk between runs
+"""
+
+_NUMPY_FFT_OUT = np.lib.NumpyVersion(np.__version__) >= '2.0.0'  # np.fft takes out= since 2.0
+
+class NumpyFFT:
+    """ np.fft """
+    name = 'numpy'
+
+    def rfft2(self, a, out=None):
+        if out is None:
+            return np.fft.rfft2(a)
+        if _NUMPY_FFT_OUT:
+            return np.fft.rfft2(a, out=out)
+        out[...] = np.fft.rfft2(a)
+        return out
+
+    def irfft2(self, a_hat, s, out=None):
+        if out is None:
+            return np.fft.irfft2(a_hat, s=s)
+        if _NUMPY_FFT_OUT:
+            # not irfft2, which drops its out= argument
+            return np.fft.irfftn(a_hat, s=s, axes=(-2, -1), out=out)
+        out[...] = np.fft.irfft2(a_hat, s=s)
+        return out
+
+    def rfft3(self, a, out=None):
+        if out is None or not _NUMPY_FFT_OUT:
+            return _into(np.fft.rfftn(a, axes=(-3, -2, -1)), out)
+        return np.fft.rfftn(a, axes=(-3, -2, -1), out=out)
+
+    def irfft3(self, a_hat, s, out=None):
+        if out is None or not _NUMPY_FFT_OUT:
+            return _into(np.fft.irfftn(a_hat, s=s, axes=(-3, -2, -1)), out)
+        return np.fft.irfftn(a_hat, s=s, axes=(-3, -2, -1), out=out)
+
+    def close(self):
+        pass
+
+class ScipyFFT:
+    """ scipy.fft, multithreaded over `workers` threads (-1 = all cores) """
+    name = 'scipy'
+
+    def __init__(self, workers=-1):
+        import scipy.fft
+        self._fft = scipy.fft
+        self.workers = workers
+
+    def rfft2(self, a, out=None):
+        a_hat = self._fft.rfft2(a, workers=self.workers)
+        if out is None:
+            return a_hat
+        out[...] = a_hat
+        return out
+
+    def irfft2(self, a_hat, s, out=None):
+        a = self._fft.irfft2(a_hat, s=s, workers=self.workers)
+        if out is None:
+            return a
+        out[...] = a
+        return out
+
+    def rfft3(self, a, out=None):
+        return _into(self._fft.rfftn(a, axes=(-3, -2, -1), workers=self.workers), out)
+
+    def irfft3(self, a_hat, s, out=None):
+        return _into(self._fft.irfftn(a_hat, s=s, axes=(-3, -2, -1), workers=self.workers), out)
+
+    def close(self):
+        pass
+
+class FFTWFFT:
+    """ pyFFTW, one plan per (direction, shape, dtype) built on aligned buffers,
+    with FFTW wisdom loaded from / saved to `wisdom_file` """
+    name = 'pyfftw'
+
+    def __init__(self, threads=-1, wisdom_file=None, planner_effort='FFTW_MEASURE'):
+        import pyfftw
+        self._pyfftw = pyfftw
+        self.threads = os.cpu_count() if threads in (None, -1) else threads
+        self.wisdom_file = wisdom_file
+        self.planner_effort = planner_effort
+        self._plans = {}
+        self._new_plans = False
+        if wisdom_file is not None and os.path.exists(wisdom_file):
+            with open(wisdom_file, 'rb') as f:
+                pyfftw.import_wisdom(pickle.load(f))
+
+    def _plan(self, direction, shape, dtype, ndim=2):
+        """ return the cached plan over the last `ndim` axes, planning (and aligning 
+        its buffers) on first use. `shape` is always the shape of the real array """
+        key = (direction, shape, np.dtype(dtype), ndim)
+        axes = tuple(range(-ndim, 0))
+        plan = self._plans.get(key)
+        if plan is None:
+            real_dtype = np.dtype(dtype)
+            complex_dtype = np.result_type(real_dtype, np.complex64)
+            real = self._pyfftw.empty_aligned(shape, dtype=real_dtype)
+            spec = self._pyfftw.empty_aligned(shape[:-1] + (shape[-1]//2 + 1,), dtype=complex_dtype)
+            if direction == 'forward':
+                plan = self._pyfftw.FFTW(real, spec, axes=axes, direction='FFTW_FORWARD',
+                                         flags=(self.planner_effort,), threads=self.threads)
+            else:
+                # c2r transforms overwrite their input, which is our own buffer here
+                plan = self._pyfftw.FFTW(spec, real, axes=axes, direction='FFTW_BACKWARD',
+                                         flags=(self.planner_effort, 'FFTW_DESTROY_INPUT'), threads=self.threads)
+            self._plans[key] = plan
+            self._new_plans = True
+        return plan
+
+    def rfft2(self, a, out=None):
+        return self._rfftn(a, 2, out)
+
+    def irfft2(self, a_hat, s, out=None):
+        return self._irfftn(a_hat, s, out)
+
+    def rfft3(self, a, out=None):
+        return self._rfftn(a, 3, out)
+
+    def irfft3(self, a_hat, s, out=None):
+        return self._irfftn(a_hat, s, out)
+
+    def _rfftn(self, a, ndim, out):
+        plan = self._plan('forward', a.shape, a.dtype, ndim)
+        plan.input_array[...] = a
+        plan.execute()
+        if out is None:
+            return plan.output_array.copy()
+        out[...] = plan.output_array
+        return out
+
+    def _irfftn(self, a_hat, s, out):
+        real_dtype = np.finfo(a_hat.dtype).dtype
+        plan = self._plan('backward', a_hat.shape[:-len(s)] + tuple(s), real_dtype, len(s))
+        plan.input_array[...] = a_hat
+        plan.execute()
+        # FFTW does not normalise the inverse transform
+        norm = 1.0 / np.prod(s)
+        if out is None:
+            out = plan.output_array * norm
+        else:
+            np.multiply(plan.output_array, norm, out=out)
+        return out
+
+    def close(self):
+        """ persist the wisdom gathered while planning, so the next run plans instantly """
+        if self.wisdom_file is not None and self._new_plans:
+            tmp = self.wisdom_file + '.tmp'
+            with open(tmp, 'wb') as f:
+                pickle.dump(self._pyfftw.export_wisdom(), f)
+            os.replace(tmp, self.wisdom_file)
+            self._new_plans = False
+
+def _into(a, out):
+    """ return a, copied into out if given """
+    if out is None:
+        return a
+    out[...] = a
+    return out
+
+FFT_BACKENDS = {
+    'numpy': NumpyFFT,
+    'scipy': ScipyFFT,
+    'pyfftw': FFTWFFT,
+}
+
+def get_fft_backend(name='numpy', workers=-1, wisdom_file=None):
+    """ return an FFT backend by name, `workers` threads (-1 = all cores) """
+    if name == 'numpy':
+        return NumpyFFT()
+    if name == 'scipy':
+        return ScipyFFT(workers=workers)
+    if name == 'pyfftw':
+        return FFTWFFT(threads=workers, wisdom_file=wisdom_file)
+    raise ValueError(f"unknown FFT backend '{name}', choose from {sorted(FFT_BACKENDS)}")
@@ -0,0 +1,194 @@
+import os
+import queue
+import subprocess
+import threading
+import numpy as np
+
+"""
+Streaming output for the fluid simulations
+
+Frames are handed to a writer as they are produced and encoded/stored on a
+background thread, so I/O overlaps with the solver and memory stays bounded
+(at most `max_queued` frames are in flight) no matter how long the run is.
+
+    .mp4         piped to ffmpeg as raw RGB, colour mapped like the old imshow
+    .npy         preallocated (n_frames, N, N) memory mapped array
+    .h5 / .hdf5  resizable 'wz' dataset, needs h5py
+
+Raw outputs can be reopened at frame `start` when a run is resumed from a
+checkpoint; frames written after that checkpoint are overwritten.
+"""
+
+class StreamingWriter:
+    """ base class, subclasses implement _write(frame) and _finish() """
+
+    def __init__(self, max_queued=8, start=0):
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._error = None
+        self.n_written = start
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                self._queue.task_done()
+                break
+            if self._error is None:  # otherwise keep draining so write() never blocks on a dead writer
+                try:
+                    self._write(frame)
+                    self.n_written += 1
+                except Exception as e:
+                    self._error = e
+            self._queue.task_done()
+
+    def write(self, frame):
+        """ queue a copy of `frame`, blocks while `max_queued` frames are pending """
+        if self._error is not None:
+            raise self._error
+        self._queue.put(np.array(frame, copy=True))
+
+    def flush(self):
+        """ wait until all queued frames are written and on disk (before a checkpoint) """
+        self._queue.join()
+        if self._error is not None:
+            raise self._error
+        self._flush()
+
+    def close(self):
+        """ flush all pending frames and finalize the file """
+        self._queue.put(None)
+        self._thread.join()
+        self._finish()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write(self, frame):
+        raise NotImplementedError
+
+    def _flush(self):
+        pass
+
+    def _finish(self):
+        pass
+
+class FFmpegWriter(StreamingWriter):
+    """ encode frames to an MP4 through an ffmpeg pipe """
+
+    def __init__(self, path, shape, fps=20, cmap='RdBu', scale=1, max_queued=8):
+        from matplotlib import colormaps
+        self._cmap = colormaps[cmap]
+        self._proc = subprocess.Popen(ffmpeg_command(path, shape, fps=fps, scale=scale), stdin=subprocess.PIPE)
+        super().__init__(max_queued)
+
+    def _write(self, frame):
+        self._proc.stdin.write(colorize(frame, self._cmap))
+
+    def _finish(self):
+        self._proc.stdin.close()
+        if self._proc.wait() != 0 and self._error is None:
+            self._error = RuntimeError(f"ffmpeg exited with code {self._proc.returncode}")
+
+class NpyWriter(StreamingWriter):
+    """ store raw frames in a preallocated .npy memmap of shape (n_frames, *shape) """
+
+    def __init__(self, path, shape, n_frames, dtype=np.float64, max_queued=8, start=0):
+        shape = (n_frames,) + tuple(shape)
+        if start > 0:
+            old = np.load(path, mmap_mode='r')
+            if old.shape != shape:
+                # the run was extended, grow the file keeping the frames before `start`
+                tmp = path + '.tmp.npy'
+                new = np.lib.format.open_memmap(tmp, mode='w+', dtype=old.dtype, shape=shape)
+                new[:start] = old[:start]
+                new.flush()
+                del new, old
+                os.replace(tmp, path)
+            self._frames = np.load(path, mmap_mode='r+')
+        else:
+            self._frames = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+        super().__init__(max_queued, start=start)
+
+    def _write(self, frame):
+        self._frames[self.n_written] = frame
+
+    def _flush(self):
+        self._frames.flush()
+
+    def _finish(self):
+        self._frames.flush()
+        del self._frames
+
+class HDF5Writer(StreamingWriter):
+    """ append raw frames to the resizable dataset `name` of an HDF5 file """
+
+    def __init__(self, path, shape, dtype=np.float64, name='wz', max_queued=8, start=0):
+        import h5py
+        if start > 0:
+            self._file = h5py.File(path, 'a')
+            self._frames = self._file[name]
+            self._frames.resize(start, axis=0)
+        else:
+            self._file = h5py.File(path, 'w')
+            self._frames = self._file.create_dataset(name, shape=(0,) + tuple(shape), maxshape=(None,) + tuple(shape),
+                                                     dtype=dtype, chunks=(1,) + tuple(shape))
+        super().__init__(max_queued, start=start)
+
+    def _write(self, frame):
+        self._frames.resize(self.n_written + 1, axis=0)
+        self._frames[self.n_written] = frame
+
+    def _flush(self):
+        self._file.flush()
+
+    def _finish(self):
+        self._file.close()
+
+def ffmpeg_command(path, shape, fps=20, scale=1):
+    """ ffmpeg command line reading raw rgb24 frames of `shape` from stdin,
+    upscaled `scale` times without smoothing, into an H.264 MP4 """
+    h, w = shape
+    return ['ffmpeg', '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{w}x{h}', '-r', str(fps), '-i', '-',
+            '-vf', f'scale=trunc(iw*{scale}/2)*2:trunc(ih*{scale}/2)*2:flags=neighbor',
+            '-vcodec', 'libx264', '-pix_fmt', 'yuv420p', path]
+
+def colorize(frame, cmap):
+    """ return the rgb24 bytes of `frame` colour mapped over its own min/max with
+    the y axis pointing up, like imshow + invert_yaxis did """
+    lo, hi = frame.min(), frame.max()
+    norm = (frame - lo) / (hi - lo) if hi > lo else np.zeros_like(frame)
+    rgb = cmap(norm[::-1], bytes=True)[..., :3]
+    return np.ascontiguousarray(rgb).tobytes()
+
+def open_frame_writer(path, shape, n_frames, fps=20, cmap='RdBu', scale=1, dtype=np.float64, start=0):
+    """ return a streaming writer for `path`, chosen by its extension
+    (fps, cmap and scale only apply to videos, dtype and start only to raw frames) """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.mp4':
+        if start > 0:
+            raise ValueError("an .mp4 can't be resumed, write raw frames (.npy/.h5) and render them afterwards")
+        return FFmpegWriter(path, shape, fps=fps, cmap=cmap, scale=scale)
+    if ext == '.npy':
+        return NpyWriter(path, shape, n_frames, dtype=dtype, start=start)
+    if ext in ('.h5', '.hdf5'):
+        return HDF5Writer(path, shape, dtype=dtype, start=start)
+    raise ValueError(f"don't know how to write frames to '{path}' (use .mp4, .npy or .h5)")
+
+def count_frames(Nt, dt, tOut):
+    """ number of frames the main loops output, using the same float arithmetic
+    as their `t += dt` so the preallocated .npy is never too short """
+    t = 0
+    n = 0
+    for i in range(Nt):
+        t += dt
+        if t + dt > (n + 1) * tOut or i == Nt-1:
+            n += 1
+    return n
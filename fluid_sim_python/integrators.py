@@ -0,0 +1,175 @@
+import numpy as np
+
+"""
+Time integrators of the spectral fluid solver, on top of SpectralWorkspace
+
+    euler   explicit Euler advection, implicit Euler diffusion (the original 
+            scheme, 1st order, 1 rhs per step)
+    rk3     Williamson's low-storage (2N) 3rd order Runge-Kutta with an 
+            integrating factor for the viscous term (3 rhs, 2 extra spectra)
+    ifrk4   classical RK4 with an integrating factor (Lawson), 4th order 
+            (4 rhs, 6 extra spectra)
+
+The integrating factor exp(-nu*kSq*h) solves the diffusion exactly, so only 
+the advection term limits dt. The rhs is the projected, dealiased advection 
+term of ws.spectral_rhs(), which also leaves the velocity of the first stage 
+in (ws.vx, ws.vy) for the CFL condition.
+"""
+
+class Euler:
+    """ ws.spectral_step, split like the other integrators """
+    stages = 1
+
+    def __init__(self, ws):
+        self.ws = ws
+
+    def arrays(self):
+        """ return the arrays the integrator holds on top of the workspace """
+        return ()
+
+    def step(self, vx_hat, vy_hat, dt, nu, rhs_ready=False):
+        """ advance (vx_hat,vy_hat) in place by dt, with rhs_ready if ws.spectral_rhs() 
+        was already called on them """
+        if not rhs_ready:
+            self.ws.spectral_rhs(vx_hat, vy_hat)
+        return self.ws.spectral_update(vx_hat, vy_hat, dt, nu)
+
+class IntegratingFactor:
+    """ base class, caches the factors exp(-nu*kSq*c*dt) for the stage fractions c """
+    fractions = ()
+
+    def __init__(self, ws):
+        self.ws = ws
+        self._key = None
+        self._factors = {}
+
+    def arrays(self):
+        """ return the arrays the integrator holds on top of the workspace """
+        arrays = []
+        for value in vars(self).values():
+            arrays += value if isinstance(value, list) else [value]
+        return tuple(a for a in arrays if self.ws.xp.is_array(a)) + tuple(self._factors.values())
+
+    def spectra(self):
+        """ return a new [x, y] pair of uninitialised spectra shaped like the state """
+        shape = tuple(self.ws.f_hat.shape)
+        return [self.ws.xp.empty(shape, complex=True), self.ws.xp.empty(shape, complex=True)]
+
+    def factors(self, dt, nu):
+        """ return {c: exp(-nu*kSq*c*dt)}, recomputed only when dt or nu change """
+        key = (dt, np.shape(nu), np.asarray(nu).tobytes())
+        if self._key != key:
+            xp = self.ws.xp
+            shape = np.broadcast_shapes(tuple(self.ws.kSq.shape), np.shape(nu))
+            for c in self.fractions:
+                if c not in self._factors or tuple(self._factors[c].shape) != shape:
+                    self._factors[c] = xp.empty(shape)
+                neg_nu_h = -c*dt*nu if np.ndim(nu) == 0 else xp.asarray(-c*dt*np.asarray(nu))
+                xp.multiply(self.ws.kSq, neg_nu_h, out=self._factors[c])
+                xp.exp(self._factors[c], out=self._factors[c])
+            self._key = key
+        return self._factors
+
+class RK3(IntegratingFactor):
+    """ Williamson (1980) 2N-storage RK3, stage times 0, 1/3, 3/4: each stage 
+    does q = a*q + dt*rhs(u), u += b*q and moves u and q to the next stage 
+    time with the integrating factor """
+    stages = 3
+    a = (0.0, -5/9, -153/128)
+    b = (1/3, 15/16, 8/15)
+    c = (0.0, 1/3, 3/4, 1.0)
+    fractions = (1/3, 5/12, 1/4)  # c[i+1] - c[i]
+
+    def __init__(self, ws):
+        super().__init__(ws)
+        self.qx, self.qy = self.spectra()
+
+    def step(self, vx_hat, vy_hat, dt, nu, rhs_ready=False):
+        ws, xp = self.ws, self.ws.xp
+        E = self.factors(dt, nu)
+        for i in range(self.stages):
+            if i > 0 or not rhs_ready:
+                ws.spectral_rhs(vx_hat, vy_hat)
+            for v_hat, q, rhs in ((vx_hat, self.qx, ws.rhs_x_hat), (vy_hat, self.qy, ws.rhs_y_hat)):
+                if i == 0:
+                    xp.multiply(rhs, dt, out=q)
+                else:
+                    q *= self.a[i]
+                    rhs *= dt
+                    q += rhs
+                xp.multiply(q, self.b[i], out=ws.tmp_hat)
+                v_hat += ws.tmp_hat
+                v_hat *= E[self.fractions[i]]
+                if i < self.stages - 1:
+                    q *= E[self.fractions[i]]
+        return vx_hat, vy_hat
+
+class IFRK4(IntegratingFactor):
+    """ Lawson's integrating factor RK4, with E = exp(-nu*kSq*dt/2):
+        k1 = rhs(u),  u1 = E(u + dt/2 k1)
+        k2 = rhs(u1), u2 = E u + dt/2 k2
+        k3 = rhs(u2), u3 = E(E u + dt k3)
+        k4 = rhs(u3), u  = E(E(u + dt/6 k1) + dt/3 (k2 + k3)) + dt/6 k4 """
+    stages = 4
+    fractions = (0.5,)
+
+    def __init__(self, ws):
+        super().__init__(ws)
+        self.u0 = self.spectra()
+        self.acc = self.spectra()
+        self.stage = self.spectra()
+
+    def step(self, vx_hat, vy_hat, dt, nu, rhs_ready=False):
+        ws, xp = self.ws, self.ws.xp
+        E = self.factors(dt, nu)[0.5]
+        u = [vx_hat, vy_hat]
+        rhs = (ws.rhs_x_hat, ws.rhs_y_hat)
+
+        # k1: acc = E(u + dt/6 k1), stage = E(u + dt/2 k1), u0 = E u
+        if not rhs_ready:
+            ws.spectral_rhs(*u)
+        for d in range(2):
+            xp.multiply(u[d], E, out=self.u0[d])
+            xp.multiply(rhs[d], dt/6, out=self.acc[d])
+            self.acc[d] += u[d]
+            self.acc[d] *= E
+            xp.multiply(rhs[d], dt/2, out=self.stage[d])
+            self.stage[d] += u[d]
+            self.stage[d] *= E
+
+        # k2: acc += dt/3 k2, stage = E u + dt/2 k2
+        ws.spectral_rhs(*self.stage)
+        for d in range(2):
+            xp.multiply(rhs[d], dt/3, out=ws.tmp_hat)
+            self.acc[d] += ws.tmp_hat
+            xp.multiply(rhs[d], dt/2, out=self.stage[d])
+            self.stage[d] += self.u0[d]
+
+        # k3: acc += dt/3 k3, stage = E(E u + dt k3)
+        ws.spectral_rhs(*self.stage)
+        for d in range(2):
+            xp.multiply(rhs[d], dt/3, out=ws.tmp_hat)
+            self.acc[d] += ws.tmp_hat
+            xp.multiply(rhs[d], dt, out=self.stage[d])
+            self.stage[d] += self.u0[d]
+            self.stage[d] *= E
+
+        # k4: u = E acc + dt/6 k4
+        ws.spectral_rhs(*self.stage)
+        for d in range(2):
+            xp.multiply(self.acc[d], E, out=u[d])
+            xp.multiply(rhs[d], dt/6, out=ws.tmp_hat)
+            u[d] += ws.tmp_hat
+        return vx_hat, vy_hat
+
+INTEGRATORS = {
+    'euler': Euler,
+    'rk3':   RK3,
+    'ifrk4': IFRK4,
+}
+
+def get_integrator(name, ws):
+    """ return the integrator `name` of INTEGRATORS, stepping with the workspace ws """
+    if name not in INTEGRATORS:
+        raise ValueError(f"unknown integrator '{name}', choose from {sorted(INTEGRATORS)}")
+    return INTEGRATORS[name](ws)
@@ -0,0 +1,81 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+import numpy as np
+from solver import main as solve
+
+"""
+Accuracy report of the float32 solver against float64
+
+    python precision.py --N 256 --tEnd 1 -- --integrator rk3
+
+Runs the same simulation in float64, in float32 and in float32 with the 
+diagnostics accumulated in float64, and compares the energy decay, the 
+enstrophy and the vorticity frames to the float64 run, next to the wall 
+clock time of each run. Any other solver flag can be passed after --.
+"""
+
+def run(tmp, name, argv):
+    """ run the solver, return (seconds, diagnostics, frames) """
+    frames = os.path.join(tmp, name + '.npy')
+    diagnostics = os.path.join(tmp, name + '.npz')
+    tic = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        solve(argv + ['--headless', '--output', frames, '--diagnostics', diagnostics])
+    seconds = time.perf_counter() - tic
+    with np.load(diagnostics) as d:
+        diag = {key: d[key] for key in d.files}
+    return seconds, diag, np.load(frames)
+
+def relative(a, b):
+    """ max |a/b - 1| """
+    return float(np.max(np.abs(np.asarray(a, dtype=np.float64) / b - 1)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="float32 vs float64 accuracy of the fluid solver")
+    parser.add_argument('--N', type=int, default=128)
+    parser.add_argument('--tEnd', type=float, default=1)
+    parser.add_argument('--json', help="also write the report to this JSON file")
+    parser.add_argument('solver_args', nargs='*', help="further solver flags, after --")
+    args = parser.parse_args(argv)
+    base = ['--N', str(args.N), '--tEnd', str(args.tEnd)] + args.solver_args
+
+    runs = {
+        'float64':        base + ['--precision', 'float64'],
+        'float32':        base + ['--precision', 'float32'],
+        'float32+diag64': base + ['--precision', 'float32', '--diag-float64'],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {name: run(tmp, name, argv) for name, argv in runs.items()}
+
+    seconds64, ref, frames64 = results['float64']
+    decay64 = np.diff(ref['energy']) / np.diff(ref['t'])
+    report = {}
+    print(f"[INFO]: N = {args.N}, t = 0..{args.tEnd:g}, {len(ref['t'])} frames, energy {ref['energy'][0]:.6g} -> {ref['energy'][-1]:.6g}")
+    print(f"{'run':>15} {'seconds':>8} {'speedup':>8} {'energy':>9} {'decay':>9} {'enstrophy':>9} {'vorticity':>9}")
+    for name, (seconds, diag, frames) in results.items():
+        decay = np.diff(diag['energy'].astype(np.float64)) / np.diff(ref['t'])
+        report[name] = {
+            'seconds': seconds,
+            'speedup': seconds64 / seconds,
+            'energy_error': relative(diag['energy'], ref['energy']),       # max relative error of E(t)
+            'decay_error': relative(decay, decay64),                        # ... of dE/dt
+            'enstrophy_error': relative(diag['enstrophy'], ref['enstrophy']),
+            'vorticity_error': float(np.max(np.abs(frames - frames64)) / np.max(np.abs(frames64))),
+        }
+        r = report[name]
+        print(f"{name:>15} {seconds:>8.2f} {r['speedup']:>8.2f} {r['energy_error']:>9.1e} {r['decay_error']:>9.1e} "
+              f"{r['enstrophy_error']:>9.1e} {r['vorticity_error']:>9.1e}")
+
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    return 0
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import argparse
+import os
+import subprocess
+import multiprocessing
+import numpy as np
+from frame_writer import colorize, ffmpeg_command
+
+"""
+Render the raw vorticity frames of a headless run (cpu.py --headless) to video
+
+    python render.py fields.npy -o navier-stokes-spectral-animation.mp4 --processes 8
+
+Colour mapping is done by a process pool, each worker reading its frames
+straight from the .npy memmap / .h5 file, while ffmpeg encodes in order.
+Ensemble runs store (frames, members, N, N), pick one with --member.
+"""
+
+def open_frames(path):
+    """ return the (n_frames, [members,] N, N) frames stored at `path` without loading them """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.npy':
+        return np.load(path, mmap_mode='r')
+    if ext in ('.h5', '.hdf5'):
+        import h5py
+        return h5py.File(path, 'r')['wz']
+    raise ValueError(f"don't know how to read frames from '{path}' (use .npy or .h5)")
+
+_frames = None
+_member = None
+_cmap = None
+
+def _init_worker(path, member, cmap):
+    global _frames, _member, _cmap
+    from matplotlib import colormaps
+    _frames = open_frames(path)
+    _member = member
+    _cmap = colormaps[cmap]
+
+def _render_frame(i):
+    frame = _frames[i] if _member is None else _frames[i, _member]
+    return colorize(np.asarray(frame), _cmap)
+
+def render(path, output, processes=None, fps=20, cmap='RdBu', scale=None, member=None):
+    """ encode all frames of `path` (of ensemble `member`) into the video `output` """
+    frames = open_frames(path)
+    if (frames.ndim == 4) != (member is not None):
+        raise ValueError(f"{path} has frames of shape {frames.shape[1:]}, give --member only for ensemble runs")
+    n_frames, N = frames.shape[0], frames.shape[-1]
+    scale = max(1, 960//N) if scale is None else scale
+    proc = subprocess.Popen(ffmpeg_command(output, frames.shape[-2:], fps=fps, scale=scale), stdin=subprocess.PIPE)
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(path, member, cmap)) as pool:
+        for rgb in pool.imap(_render_frame, range(n_frames), chunksize=8):
+            proc.stdin.write(rgb)
+    proc.stdin.close()
+    if proc.wait() != 0:
+        raise RuntimeError(f"ffmpeg exited with code {proc.returncode}")
+    return n_frames
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="render stored vorticity frames to video")
+    parser.add_argument('fields', help="frames written by a headless run, .npy or .h5")
+    parser.add_argument('-o', '--output', default='navier-stokes-spectral-animation.mp4')
+    parser.add_argument('--processes', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--fps', type=int, default=20)
+    parser.add_argument('--cmap', default='RdBu')
+    parser.add_argument('--scale', type=int, default=None, help="integer upscaling (default: ~960 px)")
+    parser.add_argument('--member', type=int, default=None, help="ensemble member to render")
+    args = parser.parse_args(argv)
+
+    n_frames = render(args.fields, args.output, processes=args.processes, fps=args.fps, cmap=args.cmap,
+                      scale=args.scale, member=args.member)
+    print(f"[INFO]: wrote {n_frames} frames to {args.output}")
+
+    return 0
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import json
+import os
+import shlex
+import subprocess
+import sys
+import numpy as np
+
+"""
+Strong and weak scaling of the slab decomposed solver (distributed.py)
+
+    python scaling.py --procs 1 2 4 8 --N 512 --steps 20
+    python scaling.py --procs 1 2 4 8 --N 512 --steps 20 --weak
+    python scaling.py --procs 1 2 4 --mpirun "mpirun --oversubscribe"
+
+Strong scaling keeps N fixed, weak scaling grows N with sqrt(P) (rounded to a 
+multiple of 2P) so the grid points per rank stay about constant. Efficiency 
+is the grid points updated per second per rank relative to the first run.
+"""
+
+def weak_N(N, P):
+    """ N*sqrt(P) rounded to a multiple of 2P, so the slabs divide evenly """
+    return max(1, int(round(N * np.sqrt(P) / (2*P)))) * 2*P
+
+def bench(mpirun, P, N, steps, integrator):
+    """ return the JSON timings of `steps` timesteps of distributed.py on P ranks """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'distributed.py')
+    cmd = shlex.split(mpirun) + ['-n', str(P), sys.executable, script,
+                                 '--N', str(N), '--bench', str(steps), '--integrator', integrator]
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="strong/weak scaling of distributed.py")
+    parser.add_argument('--procs', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--N', type=int, default=512, help="grid size (of the first run with --weak)")
+    parser.add_argument('--steps', type=int, default=20)
+    parser.add_argument('--integrator', default='euler')
+    parser.add_argument('--weak', action='store_true', help="grow N with the number of ranks")
+    parser.add_argument('--mpirun', default='mpirun', help="launcher command, -n P is appended")
+    parser.add_argument('--json', help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = []
+    print(f"{'ranks':>6} {'N':>6} {'steps/s':>10} {'alltoall':>9} {'speedup':>8} {'efficiency':>10}")
+    for P in args.procs:
+        N = weak_N(args.N, P) if args.weak else args.N
+        r = bench(args.mpirun, P, N, args.steps, args.integrator)
+        r['points_per_s'] = r['steps_per_s'] * N * N
+        base = results[0] if results else r
+        r['speedup'] = r['points_per_s'] / base['points_per_s']
+        r['efficiency'] = r['speedup'] * base['ranks'] / P
+        results.append(r)
+        print(f"{P:>6} {N:>6} {r['steps_per_s']:>10.2f} {r['alltoall_share']:>8.0%} {r['speedup']:>8.2f} {r['efficiency']:>10.2f}")
+
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    return 0
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+import argparse
+import itertools
+import json
+import os
+import time
+import numpy as np
+from array_backends import ARRAY_BACKENDS, PRECISIONS, get_array_backend
+from checkpoint import load_checkpoint, save_checkpoint
+from fft_backends import FFT_BACKENDS, get_fft_backend
+from frame_writer import count_frames, open_frame_writer
+from integrators import INTEGRATORS, get_integrator
+from timestep import AdaptiveTimestep, format_stats, output_times
+from workspace import SpectralWorkspace
+
+"""
+Create Your Own Navier-Stokes Spectral Method Simulation (With Python)
+Philip Mocz (2023), @PMocz
+
+Simulate the Navier-Stokes equations (incompressible viscous fluid) 
+with a Spectral method
+
+v_t + (v.nabla) v = nu * nabla^2 v + nabla P
+div(v) = 0
+
+One solver for every device: the operators live in workspace.py and run on
+NumPy or torch arrays through array_backends.py. cpu.py and gpu.py are the
+entry points with their own default backend and parameters.
+
+"""
+
+INITIAL_CONDITIONS = ('vortex', 'parabolic')
+
+def initial_condition(xx, yy, ic='vortex', kx0=2, ky0=1, amplitude=1):
+    """ return the (vx, vy) of the initial condition `ic`: 
+    'vortex' is the shear vortex, 'parabolic' the flow gpu.py has always used """
+    if ic == 'vortex':
+        vx = -amplitude * np.sin(2*np.pi*yy*ky0)
+        vy =  amplitude * np.sin(2*np.pi*xx*kx0)
+    elif ic == 'parabolic':
+        vx = amplitude * (1 - (xx*xx - yy*yy))
+        vy = np.zeros_like(xx)
+    else:
+        raise ValueError(f"unknown initial condition '{ic}', choose from {INITIAL_CONDITIONS}")
+    return vx, vy
+
+def fourier_grid(N, L, cols=slice(None)):
+    """ return wavenumbers kx, ky, kSq, kSq_inv and the 2/3 rule dealias mask on 
+    the half spectrum used by rfft2 (the last axis only stores kx >= 0),
+    or only its kx columns `cols` """
+    klin = 2.0 * np.pi / L * np.arange(-N/2, N/2)
+    kmax = np.max(klin)
+    kx_half = (2.0 * np.pi / L * np.fft.rfftfreq(N, d=1.0/N))[cols]
+    ky_full = 2.0 * np.pi / L * np.fft.fftfreq(N, d=1.0/N)
+    kx, ky = np.meshgrid(kx_half, ky_full)
+    kSq = kx**2 + ky**2
+    kSq_inv = 1.0 / np.where(kSq==0, 1, kSq)
+    
+    # dealias with the 2/3 rule
+    dealias = (np.abs(kx) < (2./3.)*kmax) & (np.abs(ky) < (2./3.)*kmax)
+    
+    return kx, ky, kSq, kSq_inv, dealias
+
+# Simulation parameters, overridden by --config and then by the command line
+DEFAULTS = {
+    'N':    40,      # Spatial resolution
+    'tEnd': 1,       # time at which simulation ends
+    'dt':   0.001,   # timestep
+    'tOut': 0.01,    # draw frequency
+    'nu':   0.001,   # viscosity
+    'ic':   'vortex', # initial condition
+    'cfl':  None,    # adaptive timestep at this CFL number, dt is then only the first step
+    'dtMin': 1e-6,   # adaptive timestep bounds (dtMax defaults to tOut)
+    'dtMax': None,
+    'integrator': 'euler', # time integrator, see integrators.py
+    'precision': None, # float32 or float64 state (complex64/complex128 spectra), default by backend
+}
+
+def parse_args(argv=None, backend='numpy'):
+    parser = argparse.ArgumentParser(description="Navier-Stokes spectral simulation")
+    parser.add_argument('--config', help="JSON file with any of " + ", ".join(DEFAULTS))
+    parser.add_argument('--backend', choices=ARRAY_BACKENDS, default=backend, help="array library the solver runs on")
+    parser.add_argument('--device', help="torch device, e.g. cpu or cuda (default: cuda if available)")
+    parser.add_argument('--N', type=int)
+    parser.add_argument('--tEnd', type=float)
+    parser.add_argument('--dt', type=float)
+    parser.add_argument('--tOut', type=float)
+    parser.add_argument('--nu', type=float)
+    parser.add_argument('--ic', choices=INITIAL_CONDITIONS)
+    parser.add_argument('--cfl', type=float, help="adaptive timestep at this CFL number (e.g. 0.5), still hitting every tOut")
+    parser.add_argument('--dtMin', type=float, help="smallest adaptive timestep before giving up")
+    parser.add_argument('--dtMax', type=float, help="largest adaptive timestep")
+    parser.add_argument('--integrator', choices=sorted(INTEGRATORS), help="time integrator, rk3/ifrk4 allow larger steps")
+    parser.add_argument('--precision', choices=PRECISIONS, help="working precision (default: float64 for numpy, float32 for torch)")
+    parser.add_argument('--diagnostics', help="write t, energy and enstrophy at every frame to this .npz")
+    parser.add_argument('--diag-float64', action='store_true', help="accumulate the diagnostics in float64 also for float32 runs")
+    parser.add_argument('--stats', help="write the adaptive timestep stats (steps vs. fixed dt) to this JSON file")
+    parser.add_argument('--headless', action='store_true', help="batch mode: raw fields only (.npy/.h5), no video, no matplotlib")
+    parser.add_argument('--fft', choices=sorted(FFT_BACKENDS), default='numpy', help="FFT backend of the numpy solver")
+    parser.add_argument('--workers', type=int, default=-1, help="FFT threads for scipy/pyfftw (-1 = all cores)")
+    parser.add_argument('--wisdom', default='fftw_wisdom.pickle', help="pyfftw wisdom file, reused between runs")
+    parser.add_argument('--output', default='navier-stokes-spectral-animation.mp4', help="vorticity frames, .mp4, .npy or .h5")
+    parser.add_argument('--checkpoint', help="periodically save the full solver state to this .npz")
+    parser.add_argument('--checkpoint-every', type=int, default=1000, help="timesteps between checkpoints")
+    parser.add_argument('--resume', action='store_true', help="continue from --checkpoint, e.g. with a larger --tEnd")
+    parser.add_argument('--ensemble', help="JSON file of ensemble members (nu, kx0, ky0, amplitude), solved as one batch")
+    args = parser.parse_args(argv)
+    if args.ensemble and not args.output.lower().endswith(('.npy', '.h5', '.hdf5')):
+        parser.error("--ensemble writes (frames, members, N, N) raw fields, give a .npy or .h5 --output")
+    if args.resume and args.checkpoint is None:
+        parser.error("--resume needs the --checkpoint to resume from")
+    if args.headless and not args.output.lower().endswith(('.npy', '.h5', '.hdf5')):
+        parser.error("--headless writes raw fields, give a .npy or .h5 --output and use render.py for the video")
+    return args
+
+def simulation_parameters(args, base=None):
+    """ return the `base` parameters (DEFAULTS or those of a checkpoint), updated by 
+    the --config file and then by command line flags """
+    params = dict(DEFAULTS if base is None else base)
+    if args.config is not None:
+        with open(args.config) as f:
+            params.update(json.load(f))
+    for key in DEFAULTS:
+        if getattr(args, key) is not None:
+            params[key] = getattr(args, key)
+    return params
+
+def ensemble_members(path, params):
+    """ return the members of the ensemble described in the JSON file `path`, either 
+    a list of member dicts or a dict of lists whose Cartesian product is swept, e.g.
+    {"nu": [0.001, 0.002], "kx0": [1, 2, 3]}. Missing keys keep the single run values """
+    with open(path) as f:
+        spec = json.load(f)
+    if isinstance(spec, dict):
+        keys = list(spec)
+        spec = [dict(zip(keys, values)) for values in itertools.product(*spec.values())]
+    base = {'nu': params['nu'], 'kx0': 2, 'ky0': 1, 'amplitude': 1}
+    for member in spec:
+        unknown = set(member) - set(base)
+        if unknown:
+            raise ValueError(f"unknown ensemble keys {sorted(unknown)} in {path}, use {sorted(base)}")
+    return [{**base, **member} for member in spec]
+
+def main(argv=None, backend='numpy', defaults=None):
+    """ Navier-Stokes Simulation, on the array `backend` unless --backend is given, 
+    with `defaults` updating the DEFAULTS parameters """
+    args = parse_args(argv, backend=backend)
+    fft = get_fft_backend(args.fft, workers=args.workers, wisdom_file=args.wisdom) if args.backend == 'numpy' else None
+    
+    # Resume from a checkpoint, keeping its parameters unless given again
+    if args.resume:
+        arrays, meta = load_checkpoint(args.checkpoint)
+        params = simulation_parameters(args, base=meta['params'])
+        for key in ('N', 'dt', 'tOut'):
+            if params[key] != meta['params'][key]:
+                raise SystemExit(f"{key} can't change when resuming ({meta['params'][key]} in {args.checkpoint})")
+        print(f"[INFO]: resuming from {args.checkpoint} at t = {meta['t']:.4f}, step {meta['i']}")
+    else:
+        params = simulation_parameters(args, base={**DEFAULTS, **(defaults or {})})
+        members = ensemble_members(args.ensemble, params) if args.ensemble else None
+        meta = {'t': 0, 'i': 0, 'iOut': 0, 'members': members}
+    
+    xp = get_array_backend(args.backend, fft=fft, device=args.device, dtype=params.get('precision'))
+    
+    # Simulation parameters
+    N         = params['N']     # Spatial resolution
+    t         = meta['t']       # current time of the simulation
+    tEnd      = params['tEnd']  # time at which simulation ends
+    dt        = params['dt']    # timestep
+    tOut      = params['tOut']  # draw frequency
+    nu        = params['nu']    # viscosity
+    ic        = params.get('ic', 'vortex')  # initial condition
+    cfl       = params.get('cfl')   # CFL number of the adaptive timestep, None for a fixed dt
+    spectralStepping = True # keep (vx_hat,vy_hat) as the state, ~5 instead of ~20 FFTs per step
+    adaptive  = cfl is not None
+    i0        = meta['i']       # first timestep to take
+    iOut      = meta['iOut']    # frames written so far
+    members   = meta.get('members') # ensemble run: one dict per member, batched along axis 0
+    if members is not None:
+        nu = np.array([m['nu'] for m in members]).reshape(-1, 1, 1)
+    
+    if args.resume and meta.get('spectralStepping') != spectralStepping:
+        raise SystemExit(f"{args.checkpoint} was written with spectralStepping = {meta['spectralStepping']}")
+    if adaptive and not spectralStepping:
+        raise SystemExit("--cfl needs spectralStepping")
+    if params.get('integrator', 'euler') != 'euler' and not spectralStepping:
+        raise SystemExit("--integrator needs spectralStepping")
+    
+    # Domain [0,1] x [0,1]
+    L = 1    
+    xlin = np.linspace(0,L, num=N+1)  # Note: x=0 & x=1 are the same point!
+    xlin = xlin[0:N]                  # chop off periodic point
+    xx, yy = np.meshgrid(xlin, xlin)
+    
+    # Intial Condition
+    if members is None:
+        vx, vy = initial_condition(xx, yy, ic)
+    else:
+        ics = [initial_condition(xx, yy, ic, m['kx0'], m['ky0'], m['amplitude']) for m in members]
+        vx = np.stack([v[0] for v in ics])
+        vy = np.stack([v[1] for v in ics])
+    
+    # Fourier Space Variables (half spectrum, fields are real)
+    kx, ky, kSq, kSq_inv, dealias = fourier_grid(N, L)
+    
+    # State on the solver's device
+    if args.resume:
+        vx, vy = arrays.get('vx'), arrays.get('vy')
+    if spectralStepping:
+        vx_hat = xp.asarray(arrays['vx_hat']) if args.resume else xp.rfft2(xp.asarray(vx))
+        vy_hat = xp.asarray(arrays['vy_hat']) if args.resume else xp.rfft2(xp.asarray(vy))
+    else:
+        vx, vy = xp.asarray(vx), xp.asarray(vy)
+    
+    # preallocated scratch arrays, nothing is allocated inside the main loop
+    ws = SpectralWorkspace(kx, ky, kSq, kSq_inv, dealias, xp=xp, spectral=spectralStepping,
+                           batch=None if members is None else len(members))
+    integrator = get_integrator(params.get('integrator', 'euler'), ws)
+    state = (vx_hat, vy_hat) if spectralStepping else (vx, vy)
+    print(ws.memory_report(state=state + integrator.arrays()))
+    
+    # number of timesteps (with --cfl the steps are sized to land on every output time instead)
+    Nt = int(np.ceil(tEnd/dt))
+    if adaptive:
+        tFrames, onSchedule = output_times(tEnd, tOut)
+        stepper = AdaptiveTimestep(cfl, kmax=np.pi*N/L, dt=meta.get('dtAdaptive') or dt,
+                                   dt_min=params.get('dtMin') or 0, dt_max=params.get('dtMax') or tOut)
+    
+    # frames are streamed to disk on a background thread as they are produced
+    n_frames = len(tFrames) if adaptive else count_frames(Nt, dt, tOut)
+    writer = open_frame_writer(args.output, ws.field_shape, n_frames=n_frames, scale=max(1, 960//N),
+                               dtype=xp.to_numpy(ws.wz).dtype, start=iOut)
+    t0 = t
+    tic = time.perf_counter()
+    
+    # energy and enstrophy at every frame, continued when resuming
+    history = {'t': [], 'energy': [], 'enstrophy': []}
+    if args.diagnostics is not None and args.resume and os.path.exists(args.diagnostics):
+        with np.load(args.diagnostics) as old:
+            history = {key: list(old[key][:iOut]) for key in history}
+    diag_dtype = np.float64 if args.diag_float64 else None
+    
+    # Main Loop
+    i = i0
+    while (t < tFrames[-1]) if adaptive else (i < Nt):
+
+        if adaptive:
+            # the rhs does not depend on dt, which is set from the velocity it transformed anyway
+            tNext = tFrames[iOut]
+            ws.spectral_rhs( vx_hat, vy_hat )
+            dt = stepper.next_dt( ws.max_speed(), t, tNext )
+            integrator.step( vx_hat, vy_hat, dt, nu, rhs_ready=True )
+        elif spectralStepping:
+            integrator.step( vx_hat, vy_hat, dt, nu )
+        else:
+            ws.physical_step( vx, vy, dt, nu )
+        i += 1
+        
+        # update time
+        if adaptive and dt == tNext - t:
+            t = tNext  # exactly on the output time
+        else:
+            t += dt
+        
+        # write frames for animation
+        if adaptive:
+            last = t == tFrames[-1]
+            scheduled = t == tNext and (not last or onSchedule)
+            output = t == tNext
+        else:
+            last = i == Nt
+            scheduled = t + dt > (iOut + 1) * tOut
+            output = scheduled or last
+        if output:
+            # vorticity (for plotting)
+            if spectralStepping:
+                wz = ws.curl_hat( vx_hat, vy_hat, out=ws.wz )
+            else:
+                wz = ws.curl( vx, vy, out=ws.wz )
+            writer.write(xp.to_numpy(wz))
+            iOut += 1
+            if args.diagnostics is not None:
+                spectra = (vx_hat, vy_hat) if spectralStepping else (xp.rfft2(vx), xp.rfft2(vy))
+                energy, enstrophy = ws.energy_enstrophy(*spectra, dtype=diag_dtype)
+                history['t'].append(t)
+                history['energy'].append(energy)
+                history['enstrophy'].append(enstrophy)
+            if not args.headless:
+                print(f"[INFO]: t = {t:.4f}, frame {iOut}")
+        
+        # checkpoint the full solver state, after the frames before it are on disk
+        if args.checkpoint is not None and (i % args.checkpoint_every == 0 or last):
+            writer.flush()
+            if args.diagnostics is not None:
+                np.savez(args.diagnostics, **{key: np.array(value) for key, value in history.items()})
+            arrays = {'vx_hat': vx_hat, 'vy_hat': vy_hat} if spectralStepping else {'vx': vx, 'vy': vy}
+            arrays = {name: xp.to_numpy(a) for name, a in arrays.items()}
+            save_checkpoint(args.checkpoint, arrays, {
+                't': t,
+                'i': i,
+                # the extra frame at the very end is rewritten when the run is extended
+                'iOut': iOut if scheduled or not last else iOut - 1,
+                'dtAdaptive': stepper.dt if adaptive else None,
+                'spectralStepping': spectralStepping,
+                'params': params,
+                'members': members,
+            })
+    
+    # steps taken vs. a fixed dt run over the same time
+    if adaptive:
+        stats = stepper.stats(t0, t, params['dt'], time.perf_counter() - tic)
+        print(format_stats(stats, params['dt']))
+        if args.stats is not None:
+            with open(args.stats, 'w') as f:
+                json.dump(stats, f, indent=2)
+            
+    if args.diagnostics is not None:
+        np.savez(args.diagnostics, **{key: np.array(value) for key, value in history.items()})
+    writer.close()
+    xp.close()
+
+    return 0
+
+if __name__== "__main__":
+    main()
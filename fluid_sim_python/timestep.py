@@ -0,0 +1,77 @@
+import numpy as np
+
+"""
+Adaptive timestep control for the spectral fluid solver
+
+Each step the advective CFL number dt * max(|vx|+|vy|) * kmax is held at 
+`cfl`, with dt kept within [dt_min, dt_max] and allowed to grow by at most 
+`growth` per step (shrinking is immediate). Steps are shortened to land 
+exactly on the next output time, so frames are written at t = k*tOut as 
+with a fixed dt.
+"""
+
+class AdaptiveTimestep:
+    """ CFL timestep controller, also counting the steps taken """
+
+    def __init__(self, cfl, kmax, dt, dt_min=1e-6, dt_max=None, growth=1.2):
+        self.cfl = cfl
+        self.kmax = kmax
+        self.dt = dt            # last step taken, the next one grows from it
+        self.dt_min = dt_min
+        self.dt_max = np.inf if dt_max is None else dt_max
+        self.growth = growth
+        self.n_steps = 0
+        self.dt_lo = np.inf     # smallest / largest dt taken
+        self.dt_hi = 0.0
+
+    def next_dt(self, speed, t, t_next):
+        """ return the timestep from t, given the maximum speed max(|vx|+|vy|), 
+        stretched or shortened so the step after it does not leave a sliver before t_next """
+        dt = self.cfl / (self.kmax * speed) if speed > 0 else self.dt_max
+        dt = min(dt, self.growth * self.dt, self.dt_max)
+        if dt < self.dt_min:
+            raise FloatingPointError(f"CFL timestep {dt:.3g} at t = {t:.4f} fell below dt_min = {self.dt_min:.3g}, "
+                                     f"max speed {speed:.3g}, the flow has probably blown up")
+        remaining = t_next - t
+        if remaining <= dt:
+            dt = remaining
+        elif remaining < 2*dt:
+            dt = remaining / 2  # two even steps instead of a full one and a tiny one
+        else:
+            self.dt = dt  # only remember dt when it was not cut by the output time
+        self.n_steps += 1
+        self.dt_lo = min(self.dt_lo, dt)
+        self.dt_hi = max(self.dt_hi, dt)
+        return dt
+
+    def stats(self, t0, t, dt_fixed, seconds):
+        """ return {name: value} comparing the steps taken between t0 and t with 
+        a run at fixed dt_fixed, the wall-clock saving estimated from `seconds` """
+        fixed_steps = int(np.ceil((t - t0) / dt_fixed - 1e-9))
+        per_step = seconds / self.n_steps if self.n_steps else 0.0
+        return {
+            'steps': self.n_steps,
+            'fixed_steps': fixed_steps,
+            'step_ratio': self.n_steps / fixed_steps if fixed_steps else 1.0,
+            'dt_min': self.dt_lo if self.n_steps else None,
+            'dt_max': self.dt_hi if self.n_steps else None,
+            'seconds': seconds,
+            'fixed_seconds_estimate': fixed_steps * per_step,
+        }
+
+def format_stats(stats, dt_fixed):
+    """ return the stats of AdaptiveTimestep.stats() as an [INFO] line """
+    if stats['steps'] == 0:
+        return "[INFO]: adaptive dt: no steps taken"
+    return (f"[INFO]: adaptive dt: {stats['steps']} steps, dt in [{stats['dt_min']:.3g}, {stats['dt_max']:.3g}], "
+            f"fixed dt = {dt_fixed:g} needs {stats['fixed_steps']} ({stats['step_ratio']:.2f}x the steps), "
+            f"{stats['seconds']:.1f} s vs ~{stats['fixed_seconds_estimate']:.1f} s")
+
+def output_times(tEnd, tOut):
+    """ return the frame times k*tOut up to tEnd, ending with tEnd itself, and 
+    whether that last frame is on the k*tOut schedule """
+    n = tEnd / tOut
+    on_schedule = abs(n - round(n)) < 1e-9 * max(n, 1)
+    n = int(round(n)) if on_schedule else int(np.ceil(n))
+    times = [k * tOut for k in range(1, n)] + [tEnd]
+    return times, on_schedule
@@ -0,0 +1,294 @@
+import numpy as np
+from array_backends import NumpyBackend
+
+"""
+Preallocated, in-place spectral operators and timesteps of the fluid solver
+
+A SpectralWorkspace owns every scratch array the main loop needs, so a
+timestep does not allocate anything: each operator writes into `out=`
+arrays and all arithmetic goes through xp.multiply(..., out=) and friends.
+It only talks to its array backend `xp` (array_backends.py), so the same
+code runs on NumPy and on torch (CPU or CUDA).
+
+With `batch=B` all fields carry a leading ensemble axis, (B, N, N), and the
+FFTs run over the last two axes, advancing B simulations per call.
+
+With `rows=n` the real space arrays only hold n rows of the grid and the 
+wavenumbers are a slab of kx columns, as in the slab decomposed solver 
+(distributed.py), whose backend transposes between the two inside its FFTs.
+"""
+
+def abs_sq(a):
+    """ |a|^2 of a complex numpy array, without the sqrt of np.abs """
+    return a.real**2 + a.imag**2
+
+class SpectralWorkspace:
+    """ scratch arrays and in-place operators for an N x N periodic grid (or a
+    batch of B of them), given the half spectrum wavenumbers and dealias mask
+    from fourier_grid() as numpy arrays """
+
+    def __init__(self, kx, ky, kSq, kSq_inv, dealias, xp=None, spectral=True, batch=None, rows=None):
+        self.xp = xp = NumpyBackend() if xp is None else xp
+        self.shape = (kx.shape[0], kx.shape[0])  # square N x N domain
+        self.batch = batch
+        lead = () if batch is None else (batch,)
+        self.field_shape = lead + ((rows, self.shape[1]) if rows is not None else self.shape)
+        self.dealias = xp.asarray(dealias)
+        self.kSq = xp.asarray(kSq)
+
+        # constant operator factors, computed once instead of every step
+        self.ikx = xp.asarray(1j * kx)
+        self.iky = xp.asarray(1j * ky)
+        self.neg_kSq_inv = xp.asarray(-kSq_inv)
+        self._implicit_key = None
+        self._implicit = None
+
+        def real():
+            return xp.empty(self.field_shape)
+
+        def cplx():
+            return xp.empty(lead + kx.shape, complex=True)
+
+        # used by the single operators (grad, div, ...)
+        self.f_hat = cplx()
+        self.tmp_hat = cplx()
+
+        if spectral:
+            # spectral_step: real space velocity/vorticity and the nonlinear term
+            self.vx = real()
+            self.vy = real()
+            self.wz = real()
+            self.nl = real()
+            self.rhs_x_hat = cplx()
+            self.rhs_y_hat = cplx()
+            self.P_hat = cplx()
+        else:
+            # physical_step: the arrays it used to allocate every iteration
+            self.dvx_x, self.dvx_y = real(), real()
+            self.dvy_x, self.dvy_y = real(), real()
+            self.rhs_x, self.rhs_y = real(), real()
+            self.tmp = real()
+            self.P = real()
+            self.dPx, self.dPy = self.dvx_x, self.dvx_y  # free again by the time grad(P) runs
+            self.wz = real()
+
+    def arrays(self):
+        """ return {name: array} of everything the workspace owns (aliases once) """
+        arrays = {}
+        seen = set()
+        for name, value in vars(self).items():
+            if self.xp.is_array(value) and id(value) not in seen:
+                seen.add(id(value))
+                arrays[name] = value
+        return arrays
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self.arrays().values())
+
+    def memory_report(self, state=()):
+        """ return a short human readable summary of the memory held by the
+        workspace plus the solver `state` arrays """
+        state_bytes = sum(a.nbytes for a in state)
+        real_bytes = sum(a.nbytes for a in self.arrays().values() if not self.xp.is_complex(a))
+        cplx_bytes = self.nbytes - real_bytes
+        MB = 1024**2
+        batch = "" if self.batch is None else f", batch of {self.batch}"
+        return (f"[INFO]: N = {self.shape[0]}{batch}, state {state_bytes/MB:.1f} MB, "
+                f"workspace {len(self.arrays())} arrays ({real_bytes/MB:.1f} MB real + {cplx_bytes/MB:.1f} MB complex), "
+                f"total {(state_bytes + self.nbytes)/MB:.1f} MB")
+
+    def implicit_diffusion(self, dt, nu):
+        """ return 1/(1+dt*nu*kSq), recomputed only when dt or nu change
+        (nu may be a (B, 1, 1) array of per member viscosities) """
+        key = (dt, np.shape(nu), np.asarray(nu).tobytes())
+        if self._implicit_key != key:
+            shape = np.broadcast_shapes(tuple(self.kSq.shape), np.shape(nu))
+            if self._implicit is None or tuple(self._implicit.shape) != shape:
+                self._implicit = self.xp.empty(shape)
+            dt_nu = dt*nu if np.ndim(nu) == 0 else self.xp.asarray(dt*np.asarray(nu))
+            self.xp.multiply(self.kSq, dt_nu, out=self._implicit)
+            self._implicit += 1.0
+            self.xp.reciprocal(self._implicit, out=self._implicit)
+            self._implicit_key = key
+        return self._implicit
+
+    # single operators
+
+    def poisson_solve(self, rho, out):
+        """ solve the Poisson equation, given source field rho """
+        self.xp.rfft2(rho, out=self.f_hat)
+        self.f_hat *= self.neg_kSq_inv
+        return self.xp.irfft2(self.f_hat, self.shape, out=out)
+
+    def diffusion_solve(self, v, dt, nu, out):
+        """ solve the diffusion equation over a timestep dt, given viscosity nu """
+        self.xp.rfft2(v, out=self.f_hat)
+        self.f_hat *= self.implicit_diffusion(dt, nu)
+        return self.xp.irfft2(self.f_hat, self.shape, out=out)
+
+    def grad(self, v, out_x, out_y):
+        """ gradient of v into (out_x, out_y) """
+        self.xp.rfft2(v, out=self.f_hat)
+        self.xp.multiply(self.ikx, self.f_hat, out=self.tmp_hat)
+        self.xp.irfft2(self.tmp_hat, self.shape, out=out_x)
+        self.xp.multiply(self.iky, self.f_hat, out=self.tmp_hat)
+        self.xp.irfft2(self.tmp_hat, self.shape, out=out_y)
+        return out_x, out_y
+
+    def div(self, vx, vy, out):
+        """ divergence of (vx,vy) into out, summed in spectral space (3 FFTs) """
+        self.xp.rfft2(vx, out=self.f_hat)
+        self.f_hat *= self.ikx
+        self.xp.rfft2(vy, out=self.tmp_hat)
+        self.tmp_hat *= self.iky
+        self.f_hat += self.tmp_hat
+        return self.xp.irfft2(self.f_hat, self.shape, out=out)
+
+    def curl(self, vx, vy, out):
+        """ curl of (vx,vy) into out, summed in spectral space (3 FFTs) """
+        self.xp.rfft2(vy, out=self.f_hat)
+        self.f_hat *= self.ikx
+        self.xp.rfft2(vx, out=self.tmp_hat)
+        self.tmp_hat *= self.iky
+        self.f_hat -= self.tmp_hat
+        return self.xp.irfft2(self.f_hat, self.shape, out=out)
+
+    def curl_hat(self, vx_hat, vy_hat, out):
+        """ vorticity of the spectra (vx_hat,vy_hat) into the real array out """
+        self.xp.multiply(self.ikx, vy_hat, out=self.f_hat)
+        self.xp.multiply(self.iky, vx_hat, out=self.tmp_hat)
+        self.f_hat -= self.tmp_hat
+        return self.xp.irfft2(self.f_hat, self.shape, out=out)
+
+    def apply_dealias(self, f, out):
+        """ apply 2/3 rule dealias to field f """
+        self.xp.rfft2(f, out=self.f_hat)
+        self.f_hat *= self.dealias
+        return self.xp.irfft2(self.f_hat, self.shape, out=out)
+
+    # full timesteps, updating the state arrays in place
+
+    def physical_step(self, vx, vy, dt, nu):
+        """ advance (vx,vy) by one timestep in place, every operator does its own 
+        FFT round-trip (the original scheme, kept as a reference) """
+
+        # Advection: rhs = -(v.grad)v
+        self.grad(vx, self.dvx_x, self.dvx_y)
+        self.grad(vy, self.dvy_x, self.dvy_y)
+
+        self.xp.multiply(vx, self.dvx_x, out=self.rhs_x)
+        self.xp.multiply(vy, self.dvx_y, out=self.tmp)
+        self.rhs_x += self.tmp
+        self.xp.negative(self.rhs_x, out=self.rhs_x)
+        self.xp.multiply(vx, self.dvy_x, out=self.rhs_y)
+        self.xp.multiply(vy, self.dvy_y, out=self.tmp)
+        self.rhs_y += self.tmp
+        self.xp.negative(self.rhs_y, out=self.rhs_y)
+
+        self.apply_dealias(self.rhs_x, out=self.rhs_x)
+        self.apply_dealias(self.rhs_y, out=self.rhs_y)
+
+        self.xp.multiply(self.rhs_x, dt, out=self.tmp)
+        vx += self.tmp
+        self.xp.multiply(self.rhs_y, dt, out=self.tmp)
+        vy += self.tmp
+
+        # Poisson solve for pressure
+        self.div(self.rhs_x, self.rhs_y, out=self.P)
+        self.poisson_solve(self.P, out=self.P)
+        self.grad(self.P, self.dPx, self.dPy)
+
+        # Correction (to eliminate divergence component of velocity)
+        self.dPx *= dt
+        vx -= self.dPx
+        self.dPy *= dt
+        vy -= self.dPy
+
+        # Diffusion solve (implicit)
+        self.diffusion_solve(vx, dt, nu, out=vx)
+        self.diffusion_solve(vy, dt, nu, out=vy)
+
+        return vx, vy
+
+    def spectral_step(self, vx_hat, vy_hat, dt, nu):
+        """ advance (vx_hat,vy_hat) by one timestep in place without leaving spectral 
+        space, except for the nonlinear product.
+        Advection is taken in rotational form, -(v.grad)v = wz*(vy,-vx) - grad(|v|^2/2), 
+        the gradient part is removed exactly by the pressure projection, so only 
+        vx, vy, wz are transformed back (3 inverse + 2 forward FFTs per step) """
+        self.spectral_rhs(vx_hat, vy_hat)
+        return self.spectral_update(vx_hat, vy_hat, dt, nu)
+
+    def spectral_rhs(self, vx_hat, vy_hat):
+        """ first half of spectral_step: the projected, dealiased advection term 
+        into (rhs_x_hat, rhs_y_hat), leaving the velocity in (vx, vy) """
+        xp = self.xp
+
+        xp.irfft2(vx_hat, self.shape, out=self.vx)
+        xp.irfft2(vy_hat, self.shape, out=self.vy)
+        self.curl_hat(vx_hat, vy_hat, out=self.wz)
+
+        # Advection: rhs = wz*(vy,-vx), dealiased
+        xp.multiply(self.wz, self.vy, out=self.nl)
+        xp.rfft2(self.nl, out=self.rhs_x_hat)
+        self.rhs_x_hat *= self.dealias
+        xp.multiply(self.wz, self.vx, out=self.nl)
+        xp.negative(self.nl, out=self.nl)
+        xp.rfft2(self.nl, out=self.rhs_y_hat)
+        self.rhs_y_hat *= self.dealias
+
+        # Pressure projection: rhs - grad(P), with laplacian(P) = div(rhs)
+        xp.multiply(self.ikx, self.rhs_x_hat, out=self.P_hat)
+        xp.multiply(self.iky, self.rhs_y_hat, out=self.tmp_hat)
+        self.P_hat += self.tmp_hat
+        self.P_hat *= self.neg_kSq_inv
+        xp.multiply(self.ikx, self.P_hat, out=self.tmp_hat)
+        self.rhs_x_hat -= self.tmp_hat
+        xp.multiply(self.iky, self.P_hat, out=self.tmp_hat)
+        self.rhs_y_hat -= self.tmp_hat
+
+        return self.rhs_x_hat, self.rhs_y_hat
+
+    def spectral_update(self, vx_hat, vy_hat, dt, nu):
+        """ second half of spectral_step: advance (vx_hat,vy_hat) in place by dt
+        with the rhs of spectral_rhs() """
+
+        # Explicit advection and implicit diffusion in one update
+        implicit = self.implicit_diffusion(dt, nu)
+        self.rhs_x_hat *= dt
+        vx_hat += self.rhs_x_hat
+        vx_hat *= implicit
+        self.rhs_y_hat *= dt
+        vy_hat += self.rhs_y_hat
+        vy_hat *= implicit
+
+        return vx_hat, vy_hat
+
+    def max_speed(self):
+        """ max(|vx|+|vy|) over the grid (and all batch members) of the velocity 
+        left in (vx, vy) by spectral_rhs(), for the CFL condition """
+        self.xp.abs(self.vx, out=self.nl)
+        self.xp.abs(self.vy, out=self.wz)
+        self.nl += self.wz
+        return self.xp.max(self.nl)
+
+    # diagnostics
+
+    def energy_enstrophy(self, vx_hat, vy_hat, dtype=None):
+        """ return the mean kinetic energy 0.5 <|v|^2> and enstrophy 0.5 <wz^2> 
+        (per member for a batch) from the spectra, summed in `dtype` (default: 
+        the working precision, e.g. np.float64 to accumulate a float32 run in double) """
+        N = self.shape[0]
+        vx_hat, vy_hat = self.xp.to_numpy(vx_hat), self.xp.to_numpy(vy_hat)
+        dtype = np.finfo(vx_hat.dtype).dtype if dtype is None else np.dtype(dtype)
+        cdtype = np.result_type(dtype, np.complex64)
+        vx_hat, vy_hat = vx_hat.astype(cdtype, copy=False), vy_hat.astype(cdtype, copy=False)
+        ikx, iky = self.xp.to_numpy(self.ikx).astype(cdtype), self.xp.to_numpy(self.iky).astype(cdtype)
+        # the half spectrum holds every kx > 0 (but the Nyquist) for two modes, 
+        # Parseval for the unnormalised forward FFT
+        column = np.arange(vx_hat.shape[-1])
+        weight = (np.where((column == 0) | (column == N//2), 1, 2) * 0.5 / N**4).astype(dtype)
+        energy = np.sum(weight * (abs_sq(vx_hat) + abs_sq(vy_hat)), axis=(-2, -1), dtype=dtype)
+        enstrophy = np.sum(weight * abs_sq(ikx * vy_hat - iky * vx_hat), axis=(-2, -1), dtype=dtype)
+        return energy, enstrophy
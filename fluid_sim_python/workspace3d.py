@@ -0,0 +1,239 @@
+import numpy as np
+from array_backends import NumpyBackend
+from workspace import abs_sq
+
+"""
+Preallocated, in-place spectral operators of the 3D fluid solver (solver3d.py)
+
+The 3D counterpart of SpectralWorkspace: a velocity field is one (3, N, N, N) 
+array, components (vx, vy, vz) along axis 0 and the grid axes ordered (z, y, x), 
+its half spectrum (3, N, N, N//2+1) comes from rfft3 over the last three axes. 
+Wavenumbers are kept as broadcastable 1D arrays, only kSq, 1/kSq, the dealias 
+mask and the implicit diffusion factor are stored on the full spectrum.
+
+Advection is taken in rotational form, -(v.grad)v = v x w - grad(|v|^2/2), 
+the gradient being removed by the projection, so a step transforms v and 
+w = curl(v) back (6 inverse FFTs) and the three components of v x w forward.
+
+The diagnostics (energy spectrum, energy, enstrophy, vorticity magnitude on 
+a z plane) are computed from the spectrum one kz plane at a time, without 
+materialising any 3D derivative field.
+"""
+
+def fourier_grid3d(N, L):
+    """ return broadcastable wavenumbers kx (1,1,N//2+1), ky (1,N,1), kz (N,1,1), 
+    and kSq, kSq_inv and the 2/3 rule dealias mask on the (N, N, N//2+1) half spectrum """
+    klin = 2.0 * np.pi / L * np.arange(-N/2, N/2)
+    kmax = np.max(klin)
+    kx = (2.0 * np.pi / L * np.fft.rfftfreq(N, d=1.0/N)).reshape(1, 1, -1)
+    ky = (2.0 * np.pi / L * np.fft.fftfreq(N, d=1.0/N)).reshape(1, -1, 1)
+    kz = ky.reshape(-1, 1, 1)
+    kSq = kx**2 + ky**2 + kz**2
+    kSq_inv = 1.0 / np.where(kSq==0, 1, kSq)
+    
+    # dealias with the 2/3 rule
+    dealias = (np.abs(kx) < (2./3.)*kmax) & (np.abs(ky) < (2./3.)*kmax) & (np.abs(kz) < (2./3.)*kmax)
+    
+    return kx, ky, kz, kSq, kSq_inv, dealias
+
+class SpectralWorkspace3D:
+    """ scratch arrays, in-place operators and diagnostics for an N x N x N 
+    periodic grid of side L, given the wavenumbers from fourier_grid3d() """
+
+    def __init__(self, kx, ky, kz, kSq, kSq_inv, dealias, L=1, xp=None):
+        self.xp = xp = NumpyBackend() if xp is None else xp
+        N = kz.shape[0]
+        self.N = N
+        self.L = L
+        self.shape = (N, N, N)
+        self.spec_shape = kSq.shape
+        self.field_shape = (3,) + self.shape
+        self.k = (kx, ky, kz)  # numpy, for the diagnostics
+        self.dealias = xp.asarray(dealias)
+        self.kSq = xp.asarray(kSq)
+
+        # constant operator factors, computed once instead of every step
+        self.ik = tuple(xp.asarray(1j * k) for k in (kx, ky, kz))
+        self.neg_kSq_inv = xp.asarray(-kSq_inv)
+        self._implicit_key = None
+        self._implicit = None
+
+        def real(*lead):
+            return xp.empty(lead + self.shape)
+
+        def cplx(*lead):
+            return xp.empty(lead + self.spec_shape, complex=True)
+
+        self.v = real(3)
+        self.w = real(3)
+        self.nl = real()
+        self.tmp = real()
+        self.rhs_hat = cplx(3)
+        self.f_hat = cplx()
+        self.tmp_hat = cplx()
+
+    def arrays(self):
+        """ return {name: array} of everything the workspace owns """
+        return {name: value for name, value in vars(self).items() if self.xp.is_array(value)}
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self.arrays().values())
+
+    def memory_report(self, state=()):
+        """ return a short human readable summary of the memory held by the
+        workspace plus the solver `state` arrays """
+        state_bytes = sum(a.nbytes for a in state)
+        real_bytes = sum(a.nbytes for a in self.arrays().values() if not self.xp.is_complex(a))
+        cplx_bytes = self.nbytes - real_bytes
+        MB = 1024**2
+        return (f"[INFO]: N = {self.N}^3, state {state_bytes/MB:.1f} MB, "
+                f"workspace {len(self.arrays())} arrays ({real_bytes/MB:.1f} MB real + {cplx_bytes/MB:.1f} MB complex), "
+                f"total {(state_bytes + self.nbytes)/MB:.1f} MB")
+
+    def implicit_diffusion(self, dt, nu):
+        """ return 1/(1+dt*nu*kSq), recomputed only when dt or nu change """
+        if self._implicit_key != (dt, nu):
+            if self._implicit is None:
+                self._implicit = self.xp.empty(self.spec_shape)
+            self.xp.multiply(self.kSq, dt*nu, out=self._implicit)
+            self._implicit += 1.0
+            self.xp.reciprocal(self._implicit, out=self._implicit)
+            self._implicit_key = (dt, nu)
+        return self._implicit
+
+    # single operators, on one scalar field (N, N, N) or the spectrum of the velocity
+
+    def poisson_solve(self, rho, out):
+        """ solve the Poisson equation, given source field rho """
+        self.xp.rfft3(rho, out=self.f_hat)
+        self.f_hat *= self.neg_kSq_inv
+        return self.xp.irfft3(self.f_hat, self.shape, out=out)
+
+    def diffusion_solve(self, f, dt, nu, out):
+        """ solve the diffusion equation over a timestep dt, given viscosity nu """
+        self.xp.rfft3(f, out=self.f_hat)
+        self.f_hat *= self.implicit_diffusion(dt, nu)
+        return self.xp.irfft3(self.f_hat, self.shape, out=out)
+
+    def apply_dealias(self, f, out):
+        """ apply 2/3 rule dealias to field f """
+        self.xp.rfft3(f, out=self.f_hat)
+        self.f_hat *= self.dealias
+        return self.xp.irfft3(self.f_hat, self.shape, out=out)
+
+    def div_hat(self, v_hat, out):
+        """ spectrum of the divergence of the velocity spectrum v_hat into out """
+        self.xp.multiply(self.ik[0], v_hat[0], out=out)
+        for c in (1, 2):
+            self.xp.multiply(self.ik[c], v_hat[c], out=self.tmp_hat)
+            out += self.tmp_hat
+        return out
+
+    def curl_hat(self, v_hat, c, out):
+        """ spectrum of component c of the curl of the velocity spectrum v_hat into out """
+        a, b = (c + 1) % 3, (c + 2) % 3
+        self.xp.multiply(self.ik[a], v_hat[b], out=out)
+        self.xp.multiply(self.ik[b], v_hat[a], out=self.tmp_hat)
+        out -= self.tmp_hat
+        return out
+
+    def curl(self, v_hat, out):
+        """ vorticity (3, N, N, N) of the velocity spectrum v_hat into out """
+        for c in range(3):
+            self.curl_hat(v_hat, c, out=self.f_hat)
+            self.xp.irfft3(self.f_hat, self.shape, out=out[c])
+        return out
+
+    # timestep, updating the state in place
+
+    def spectral_step(self, v_hat, dt, nu):
+        """ advance v_hat by one timestep in place (explicit advection, 
+        implicit diffusion, 9 FFTs) """
+        self.spectral_rhs(v_hat)
+        return self.spectral_update(v_hat, dt, nu)
+
+    def spectral_rhs(self, v_hat):
+        """ first half of spectral_step: the projected, dealiased advection term 
+        into rhs_hat, leaving the velocity in v """
+        xp = self.xp
+        xp.irfft3(v_hat, self.shape, out=self.v)
+        self.curl(v_hat, out=self.w)
+
+        # Advection: rhs = v x w, dealiased
+        for c in range(3):
+            a, b = (c + 1) % 3, (c + 2) % 3
+            xp.multiply(self.v[a], self.w[b], out=self.nl)
+            xp.multiply(self.v[b], self.w[a], out=self.tmp)
+            self.nl -= self.tmp
+            xp.rfft3(self.nl, out=self.rhs_hat[c])
+        self.rhs_hat *= self.dealias
+
+        # Pressure projection: rhs - grad(P), with laplacian(P) = div(rhs)
+        self.div_hat(self.rhs_hat, out=self.f_hat)
+        self.f_hat *= self.neg_kSq_inv
+        for c in range(3):
+            xp.multiply(self.ik[c], self.f_hat, out=self.tmp_hat)
+            self.rhs_hat[c] -= self.tmp_hat
+
+        return self.rhs_hat
+
+    def spectral_update(self, v_hat, dt, nu):
+        """ second half of spectral_step: advance v_hat in place by dt with the 
+        rhs of spectral_rhs() """
+        self.rhs_hat *= dt
+        v_hat += self.rhs_hat
+        v_hat *= self.implicit_diffusion(dt, nu)
+        return v_hat
+
+    def max_speed(self):
+        """ max(|vx|+|vy|+|vz|) of the velocity left in v by spectral_rhs(), for the CFL condition """
+        self.xp.abs(self.v[0], out=self.nl)
+        for c in (1, 2):
+            self.xp.abs(self.v[c], out=self.tmp)
+            self.nl += self.tmp
+        return self.xp.max(self.nl)
+
+    # diagnostics
+
+    def diagnostics(self, v_hat, z=0):
+        """ return {energy, enstrophy, spectrum, wz_slice} of the velocity spectrum 
+        v_hat: the mean kinetic energy and enstrophy (0.5 <|v|^2>, 0.5 <|w|^2>), 
+        the shell averaged energy spectrum E(k) (k in units of 2 pi / L, summing 
+        to the energy) and the vorticity magnitude |w| on the plane z (index).
+        One kz plane of the spectrum is handled at a time, the slice being the 
+        kz sum of the plane spectra times exp(i kz z) """
+        N = self.N
+        kx, ky, kz = self.k[0][0], self.k[1][0], self.k[2][:, 0, 0]
+        norm = 1.0 / N**6  # Parseval for the unnormalised forward FFT
+        # the half spectrum holds every kx > 0 (but the Nyquist) for two modes
+        weight = np.where((kx == 0) | (np.arange(kx.shape[-1]) == N//2), 1.0, 2.0) * norm
+        dk = 2.0 * np.pi / self.L
+        kxy_sq = kx**2 + ky**2
+        spectrum = np.zeros(int(np.ceil(np.sqrt(3) * N/2)) + 2)
+        enstrophy = 0.0
+        z0 = z * self.L / N
+        S = np.zeros((3,) + kxy_sq.shape, dtype=complex)  # sum over kz of exp(i kz z) v_hat
+        T = np.zeros((3,) + kxy_sq.shape, dtype=complex)  # ... times kz
+
+        for p in range(N):
+            plane = self.xp.to_numpy(v_hat[:, p])
+            v_sq = abs_sq(plane).sum(axis=0)
+            k_dot_v = kx * plane[0] + ky * plane[1] + kz[p] * plane[2]
+            k_sq = kxy_sq + kz[p]**2
+            shells = np.rint(np.sqrt(k_sq) / dk).astype(int)
+            spectrum += np.bincount(shells.ravel(), weights=(0.5 * weight * v_sq).ravel(), minlength=spectrum.size)
+            # |k x v|^2 = k^2 |v|^2 - |k.v|^2
+            enstrophy += 0.5 * np.sum(weight * (k_sq * v_sq - abs_sq(k_dot_v)))
+            phase = np.exp(1j * kz[p] * z0)
+            S += phase * plane
+            T += (phase * kz[p]) * plane
+
+        w_slice = (1j * (ky * S[2] - T[1]), 1j * (T[0] - kx * S[2]), 1j * (kx * S[1] - ky * S[0]))
+        w_slice = np.fft.irfft2(np.stack(w_slice), s=(N, N)) / N
+        return {
+            'energy': float(spectrum.sum()),
+            'enstrophy': float(enstrophy),
+            'spectrum': spectrum,
+            'wz_slice': np.sqrt((w_slice**2).sum(axis=0)),
+        }
@@ -0,0 +1,181 @@
+import numpy as np
+from system import G
+
+"""
+Barnes-Hut quadtree gravity, O(N log N)
+
+The tree is a handful of flat arrays indexed by node, not a Python object per
+node. Bodies are sorted along a Morton (Z-order) curve, so every node owns a
+contiguous slice [start, start+count) of the sorted bodies and its children
+are found by the next two bits of the key; mass and centre of mass of all
+nodes come from cumulative sums over that order.
+
+Forces are evaluated for all bodies at once, walking the tree breadth first
+over (body, node) pairs: a node of width s whose centre of mass is at
+distance d from the body and offset by delta from the centre of its box is
+replaced by its total mass at its centre of mass if s/(d - delta) < theta
+(Barnes' criterion, delta keeps bodies out of accepted boxes), otherwise it
+is opened into its children, or summed directly if it is a leaf (at most
+`leaf_size` bodies). theta = 0 is the exact direct sum.
+"""
+
+DEPTH = 30  # levels of the Morton keys, 2*30 bits fit an int64
+
+def _spread_bits(q):
+    """ insert a 0 bit above every bit of the 32 bit integers `q` """
+    q = q.astype(np.int64) & 0xffffffff
+    q = (q | (q << 16)) & 0x0000ffff0000ffff
+    q = (q | (q << 8)) & 0x00ff00ff00ff00ff
+    q = (q | (q << 4)) & 0x0f0f0f0f0f0f0f0f
+    q = (q | (q << 2)) & 0x3333333333333333
+    q = (q | (q << 1)) & 0x5555555555555555
+    return q
+
+def quantize(positions, origin, width, depth=DEPTH):
+    """ integer cell (N, 2) of `positions` in the square of `width` at `origin` split into 2**depth cells per axis """
+    q = np.floor((positions - origin) / width * 2**depth)
+    return np.clip(q, 0, 2**depth - 1).astype(np.int64)
+
+def morton_keys(q):
+    """ Z-order keys of the integer cells `q` (N, 2) """
+    return _spread_bits(q[:, 0]) | (_spread_bits(q[:, 1]) << 1)
+
+class QuadTree:
+    """ array-backed quadtree over `positions` (N, 2) with `masses` (N,)
+
+    per node: start, count (slice of the sorted bodies `order`), level, node_width,
+    mass, com (centre of mass), offset (of com from the box centre) and
+    children (4 node ids, -1 where empty) """
+
+    def __init__(self, positions, masses, leaf_size=8):
+        positions = np.asarray(positions, dtype='float64')
+        masses = np.asarray(masses, dtype='float64')
+        N = len(masses)
+        self.leaf_size = leaf_size
+        lo, hi = positions.min(axis=0), positions.max(axis=0)
+        self.width = max(float((hi - lo).max()), np.finfo(float).tiny) * (1 + 1e-12)
+        self.origin = lo
+        q = quantize(positions, lo, self.width)
+        keys = morton_keys(q)
+        self.order = np.argsort(keys, kind='stable')
+        keys, q = keys[self.order], q[self.order]
+
+        # split the nodes holding more than leaf_size bodies level by level
+        start, count, level, parent, quadrant = [np.array([0])], [np.array([N])], [np.array([0])], [np.array([-1])], [np.array([0])]
+        seg_start, seg_count, seg_node = start[0], count[0], np.array([0])
+        n_nodes = 1
+        for lvl in range(1, DEPTH + 1):
+            split = seg_count > leaf_size
+            if not split.any():
+                break
+            seg_start, seg_count, seg_node = seg_start[split], seg_count[split], seg_node[split]
+            # indices of all bodies in the nodes being split, in order
+            idx = np.repeat(seg_start - np.cumsum(seg_count) + seg_count, seg_count) + np.arange(seg_count.sum())
+            owner = np.repeat(seg_node, seg_count)
+            prefix = keys[idx] >> (2 * (DEPTH - lvl))
+            first = np.ones(len(idx), dtype=bool)
+            first[1:] = (prefix[1:] != prefix[:-1]) | (owner[1:] != owner[:-1])
+            firsts = np.flatnonzero(first)
+            seg_start = idx[firsts]
+            seg_count = np.diff(np.append(firsts, len(idx)))
+            seg_node = n_nodes + np.arange(len(firsts))
+            n_nodes += len(firsts)
+            start.append(seg_start)
+            count.append(seg_count)
+            level.append(np.full(len(firsts), lvl))
+            parent.append(owner[firsts])
+            quadrant.append(prefix[firsts] & 3)
+
+        self.start = np.concatenate(start)
+        self.count = np.concatenate(count)
+        self.level = np.concatenate(level)
+        self.children = np.full((n_nodes, 4), -1)
+        parent, quadrant = np.concatenate(parent), np.concatenate(quadrant)
+        self.children[parent[1:], quadrant[1:]] = np.arange(1, n_nodes)
+        self.is_leaf = (self.children < 0).all(axis=1)
+        self.node_width = self.width / 2.0**self.level
+
+        # monopoles from cumulative sums over the sorted bodies, positions relative to the origin
+        m = masses[self.order]
+        x = positions[self.order] - lo
+        cm = np.concatenate(([0], np.cumsum(m)))
+        cmx = np.concatenate(([[0, 0]], np.cumsum(m[:, None] * x, axis=0)))
+        end = self.start + self.count
+        self.mass = cm[end] - cm[self.start]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            com = (cmx[end] - cmx[self.start]) / self.mass[:, None]
+        # massless nodes: geometric centre of their first body, they contribute nothing anyway
+        massless = ~(self.mass > 0)
+        com[massless] = x[self.start[massless]]
+        self.com = com + lo
+        corner = q[self.start] >> (DEPTH - self.level)[:, None]
+        centre = lo + (corner + 0.5) * self.node_width[:, None]
+        self.offset = np.linalg.norm(self.com - centre, axis=1)
+        self.sorted_positions = positions[self.order]
+        self.sorted_masses = m
+
+    def __len__(self):
+        return len(self.start)
+
+    def accelerations(self, targets, theta=0.5, G=G, chunk=16384):
+        """ accelerations (M, 2) at the `targets` (M, 2) positions; a target sitting
+        exactly on a body (the body itself) gets no force from it """
+        targets = np.asarray(targets, dtype='float64')
+        a = np.zeros((len(targets), 2))
+        for c0 in range(0, len(targets), chunk):
+            pos = targets[c0:c0 + chunk]
+            n_t = len(pos)
+            ax, ay = np.zeros(n_t), np.zeros(n_t)
+            body = np.arange(n_t)
+            node = np.zeros(n_t, dtype=np.int64)
+            while len(body):
+                dx = self.com[node, 0] - pos[body, 0]
+                dy = self.com[node, 1] - pos[body, 1]
+                r2 = dx*dx + dy*dy
+                r = np.sqrt(r2)
+                accept = self.node_width[node] < theta * (r - self.offset[node])
+                # far nodes: monopole
+                s = self.mass[node[accept]] / (r2[accept] * r[accept])
+                ax += np.bincount(body[accept], s * dx[accept], minlength=n_t)
+                ay += np.bincount(body[accept], s * dy[accept], minlength=n_t)
+                # near leaves: direct sum over their bodies
+                near = ~accept
+                leaf = near & self.is_leaf[node]
+                if leaf.any():
+                    lb, ln = body[leaf], node[leaf]
+                    n = self.count[ln]
+                    j = np.repeat(self.start[ln] - np.cumsum(n) + n, n) + np.arange(n.sum())
+                    lb = np.repeat(lb, n)
+                    dx = self.sorted_positions[j, 0] - pos[lb, 0]
+                    dy = self.sorted_positions[j, 1] - pos[lb, 1]
+                    r3 = dx*dx + dy*dy
+                    r3 *= np.sqrt(r3)
+                    s = np.divide(self.sorted_masses[j], r3, out=np.zeros_like(r3), where=r3 > 0)
+                    ax += np.bincount(lb, s * dx, minlength=n_t)
+                    ay += np.bincount(lb, s * dy, minlength=n_t)
+                # near internal nodes: open into their children
+                inner = near & ~self.is_leaf[node]
+                children = self.children[node[inner]]
+                keep = children >= 0
+                body = np.repeat(body[inner], keep.sum(axis=1))
+                node = children[keep]
+            a[c0:c0 + n_t, 0] = ax
+            a[c0:c0 + n_t, 1] = ay
+        a *= G
+        return a
+
+class BarnesHut:
+    """ Barnes-Hut force engine, the tree is rebuilt on every call """
+    name = 'barnes-hut'
+
+    def __init__(self, theta=0.5, leaf_size=8):
+        self.theta = theta
+        self.leaf_size = leaf_size
+
+    def accelerations(self, positions, masses, G=G, out=None):
+        tree = QuadTree(positions, masses, leaf_size=self.leaf_size)
+        a = tree.accelerations(positions, theta=self.theta, G=G)
+        if out is None:
+            return a
+        out[...] = a
+        return out
@@ -0,0 +1,72 @@
+import argparse
+import time
+import numpy as np
+from integrators import get_integrator
+from monitor import ConservationMonitor
+from scenarios import AU, YEAR, get_scenario
+
+"""
+Block timesteps against fixed-step leapfrog on Sun/Earth/Jupiter
+
+    python block_validation.py --years 12 --dt-days 40 --eta 0.02
+    python block_validation.py --scenario sun-earth-jupiter-comet --years 4 --ref-hours 0.05
+
+A fixed-step leapfrog run at --ref-hours is the reference. Against it the
+final position error of every body is printed for the block timestep run
+with blocks of --dt-days, and for fixed-step leapfrog runs at the block size
+and at the finest step the block run used, together with the force
+evaluations (in units of all N bodies), the energy drift and the wall time.
+With the sun-grazing comet only the comet needs the small steps, and the
+reference needs a step well below the comet's perihelion passage.
+"""
+
+def run(scenario, integrator, dt, t_end, **options):
+    """ final positions, force evaluations, max energy drift, seconds and the integrator of one run """
+    system = get_scenario(scenario)
+    stepper = get_integrator(integrator, system, **options)
+    monitor = ConservationMonitor(system)
+    monitor.record(0.0)
+    Nt = int(round(t_end / dt))
+    start = time.perf_counter()
+    for i in range(Nt):
+        stepper.step(dt)
+        monitor.record((i + 1) * dt)
+    seconds = time.perf_counter() - start
+    return system.positions.copy(), Nt * stepper.force_evaluations, monitor.max_drift()[0], seconds, stepper
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="validate block timesteps against fixed-step leapfrog")
+    parser.add_argument('--scenario', default='sun-earth-jupiter')
+    parser.add_argument('--years', type=float, default=12)
+    parser.add_argument('--dt-days', type=float, default=40, help="block (largest) timestep")
+    parser.add_argument('--eta', type=float, default=0.02, help="timestep accuracy parameter")
+    parser.add_argument('--max-level', type=int, default=12, help="smallest step is dt/2^max-level")
+    parser.add_argument('--ref-hours', type=float, default=1, help="timestep of the reference run")
+    args = parser.parse_args(argv)
+
+    # all runs end at the same time: a whole number of blocks, split evenly by the reference steps
+    dt = args.dt_days * 86400
+    t_end = max(1, round(args.years * YEAR / dt)) * dt
+    ref_dt = dt / max(1, round(dt / (args.ref_hours * 3600)))
+    reference = run(args.scenario, 'leapfrog', ref_dt, t_end)[0]
+
+    block = run(args.scenario, 'block', dt, t_end, eta=args.eta, max_level=args.max_level)
+    finest = dt / 2**block[4].deepest
+    runs = [('block', dt, block),
+            ('leapfrog', dt, run(args.scenario, 'leapfrog', dt, t_end)),
+            ('leapfrog', finest, run(args.scenario, 'leapfrog', finest, t_end))]
+
+    print(f"[INFO]: {args.scenario}, {t_end/YEAR:.2f} years, reference leapfrog dt = {ref_dt/3600:.3g} h, "
+          f"block levels at the end {block[4].level.tolist()}, deepest {block[4].deepest}")
+    n_bodies = len(reference)
+    errors = ' '.join(f"{'err ' + str(i) + ' [AU]':>12}" for i in range(n_bodies))
+    print(f"{'integrator':>10} {'dt [h]':>9} {'forces':>9} {'max dE/E':>9} {'seconds':>8} {errors}")
+    for name, h, (positions, forces, dE, seconds, _) in runs:
+        err = np.linalg.norm(positions - reference, axis=1) / AU
+        errors = ' '.join(f"{e:>12.2e}" for e in err)
+        print(f"{name:>10} {h/3600:>9.2f} {forces:>9.0f} {dE:>9.2e} {seconds:>8.2f} {errors}")
+
+    return 0
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import numpy as np
+
+"""
+Collision detection and response for the N-body System
+
+Detection is a uniform grid (spatial hash): bodies are sorted by the cell
+they are in, with cells at least as wide as the largest body diameter, so a
+body can only touch bodies in its own and the 8 neighbouring cells. Looking
+up the own cell and 4 of the neighbours (the other 4 are covered from their
+side) gives every candidate pair once, in O(N + candidates), and the exact
+test |x_i - x_j| < r_i + r_j keeps the colliding ones.
+
+Responses
+
+    merge    every group of touching bodies becomes one body at their centre
+             of mass, with their total mass and momentum and the radius of
+             their total volume; the others are removed from the System
+    bounce   elastic collision of every approaching pair along the line of
+             centres, conserving momentum and kinetic energy; a body touching
+             several others collides with them one after another, in rounds
+             of pairs without common bodies, until none are approaching
+"""
+
+# own cell and the 4 neighbours not visited from the other side
+_HALF_NEIGHBOURHOOD = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+
+def find_collisions(positions, radii, cell=None):
+    """ index arrays (i, j), i < j, of all pairs of overlapping bodies """
+    N = len(radii)
+    if N < 2:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    lo = positions.min(axis=0)
+    span = float((positions.max(axis=0) - lo).max())
+    cell = 2 * float(radii.max()) if cell is None else cell
+    cell = max(cell, span / 2**30, np.finfo(float).tiny)  # cell indices and keys must fit an int64
+    q = np.floor((positions - lo) / cell).astype(np.int64)
+    ny = int(q[:, 1].max()) + 3
+    keys = (q[:, 0] + 1) * ny + (q[:, 1] + 1)
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    pairs_i, pairs_j = [], []
+    for ox, oy in _HALF_NEIGHBOURHOOD:
+        # bodies of the cell at offset (ox, oy) from every body's cell: a slice of the sorted bodies
+        target = keys + ox*ny + oy
+        first = np.searchsorted(sorted_keys, target, side='left')
+        n = np.searchsorted(sorted_keys, target, side='right') - first
+        if not n.any():
+            continue
+        i = np.repeat(np.arange(N), n)
+        j = order[np.repeat(first - np.cumsum(n) + n, n) + np.arange(n.sum())]
+        if (ox, oy) == (0, 0):
+            keep = i < j
+            i, j = i[keep], j[keep]
+        d = positions[j] - positions[i]
+        touching = (d*d).sum(axis=1) < (radii[i] + radii[j])**2
+        pairs_i.append(i[touching])
+        pairs_j.append(j[touching])
+    i, j = np.concatenate(pairs_i or [np.zeros(0, np.int64)]), np.concatenate(pairs_j or [np.zeros(0, np.int64)])
+    return np.minimum(i, j), np.maximum(i, j)
+
+def groups(N, i, j):
+    """ label (N,) of the connected group of touching bodies every body is in, the smallest index of the group """
+    label = np.arange(N)
+    while True:
+        m = np.minimum(label[i], label[j])
+        new = label.copy()
+        np.minimum.at(new, i, m)
+        np.minimum.at(new, j, m)
+        new = new[new]  # pointer jumping
+        if np.array_equal(new, label):
+            return label
+        label = new
+
+def merge(system, i, j):
+    """ merge all groups of touching bodies into one body each, return the number of bodies removed """
+    if len(i) == 0:
+        return 0
+    N = len(system)
+    label = groups(N, i, j)
+    members = label != np.arange(N)
+    if not members.any():
+        return 0
+    m = system.masses
+    mass = np.bincount(label, m, minlength=N)
+    grouped = np.bincount(label, minlength=N) > 1  # first bodies of real groups, the others stay bit-exact
+    heads = grouped & (mass > 0)  # massless groups keep the position and velocity of their first body
+    for d in range(2):
+        com = np.bincount(label, m * system.positions[:, d], minlength=N)
+        momentum = np.bincount(label, m * system.velocities[:, d], minlength=N)
+        system.positions[heads, d] = com[heads] / mass[heads]
+        system.velocities[heads, d] = momentum[heads] / mass[heads]
+    system.radii[grouped] = np.cbrt(np.bincount(label, system.radii**3, minlength=N))[grouped]
+    system.masses[grouped] = mass[grouped]
+    system.keep(~members)
+    return int(members.sum())
+
+def bounce(system, i, j, max_rounds=1000):
+    """ elastic collisions of all approaching touching pairs, return the number of pair collisions resolved;
+    pairs sharing a body are resolved one after another, in rounds of pairs without common bodies """
+    if len(i) == 0:
+        return 0
+    n = system.positions[j] - system.positions[i]
+    r2 = (n*n).sum(axis=1)
+    mi, mj = system.masses[i], system.masses[j]
+    total = mi + mj
+    resolved = 0
+    for _ in range(max_rounds):
+        v = ((system.velocities[j] - system.velocities[i]) * n).sum(axis=1)
+        approaching = np.flatnonzero((v < 0) & (r2 > 0) & (total > 0))
+        if len(approaching) == 0:
+            break
+        # a matching: the approaching pairs that come first for both of their bodies
+        first = np.full(len(system), len(i))
+        np.minimum.at(first, i[approaching], approaching)
+        np.minimum.at(first, j[approaching], approaching)
+        p = approaching[(first[i[approaching]] == approaching) & (first[j[approaching]] == approaching)]
+        # impulse along n: v_i += 2 m_j/(m_i+m_j) (v_rel.n) n / |n|^2, v_j -= 2 m_i/(m_i+m_j) (v_rel.n) n / |n|^2
+        k = 2 * v[p] / (total[p] * r2[p])
+        system.velocities[i[p]] += (k * mj[p])[:, None] * n[p]
+        system.velocities[j[p]] -= (k * mi[p])[:, None] * n[p]
+        resolved += len(p)
+    return resolved
+
+RESPONSES = {
+    'merge':  merge,
+    'bounce': bounce,
+}
+
+class Collisions:
+    """ detect collisions of `system` and apply the response `name` of RESPONSES """
+
+    def __init__(self, name='merge', cell=None):
+        if name not in RESPONSES:
+            raise ValueError(f"unknown collision response '{name}', choose from {sorted(RESPONSES)}")
+        self.name = name
+        self.response = RESPONSES[name]
+        self.cell = cell
+        self.count = 0
+
+    def __call__(self, system):
+        """ handle all current collisions, return the number of bodies removed / pairs bounced """
+        i, j = find_collisions(system.positions, system.radii, cell=self.cell)
+        n = self.response(system, i, j)
+        self.count += n
+        return n
@@ -0,0 +1,49 @@
+import argparse
+from integrators import INTEGRATORS, get_integrator
+from monitor import ConservationMonitor
+from scenarios import YEAR, sun_earth_jupiter
+
+"""
+Energy and angular momentum drift of the integrators on Sun/Earth/Jupiter
+
+    python drift.py --years 12 --dt-hours 6 24 96 240
+
+For every integrator and timestep the system is run for --years and the
+largest relative energy and angular momentum errors over the run are
+printed, together with the number of force evaluations it took. Running the
+same accuracy with fewer force evaluations is the point of the higher order
+symplectic integrators.
+"""
+
+def run(integrator, dt, t_end, every=1):
+    """ max (dE, dL) and force evaluations of `integrator` with timestep dt up to t_end """
+    system = sun_earth_jupiter()
+    stepper = get_integrator(integrator, system)
+    monitor = ConservationMonitor(system)
+    monitor.record(0.0)
+    Nt = int(round(t_end / dt))
+    for i in range(Nt):
+        stepper.step(dt)
+        if (i + 1) % every == 0 or i == Nt - 1:
+            monitor.record((i + 1) * dt)
+    dE, dL = monitor.max_drift()
+    return dE, dL, Nt * stepper.force_evaluations
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="energy/angular momentum drift of the N-body integrators")
+    parser.add_argument('--integrators', nargs='+', choices=sorted(INTEGRATORS), default=list(INTEGRATORS))
+    parser.add_argument('--years', type=float, default=12, help="simulated time, about one Jupiter orbit")
+    parser.add_argument('--dt-hours', type=float, nargs='+', default=[6, 24, 96, 240])
+    parser.add_argument('--every', type=int, default=1, help="record energy every this many steps")
+    args = parser.parse_args(argv)
+
+    print(f"{'integrator':>10} {'dt [h]':>8} {'forces':>8} {'max dE/E':>10} {'max dL/L':>10}")
+    for name in args.integrators:
+        for dt_hours in args.dt_hours:
+            dE, dL, forces = run(name, dt_hours * 3600, args.years * YEAR, every=args.every)
+            print(f"{name:>10} {dt_hours:>8g} {forces:>8.0f} {dE:>10.2e} {dL:>10.2e}")
+
+    return 0
+
+if __name__ == "__main__":
+    main()
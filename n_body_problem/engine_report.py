@@ -0,0 +1,109 @@
+import argparse
+import json
+import time
+import numpy as np
+from barnes_hut import QuadTree
+from system import G, pairwise_accelerations
+
+"""
+Accuracy vs speed of the Barnes-Hut engine against the direct sum
+
+    python engine_report.py --N 1000 10000 100000 --theta 0.3 0.5 0.7 1.0
+
+For every N a random cluster (gaussian positions, masses spread over two
+decades) is built. Per theta it reports the tree build and force times, the
+speedup over the direct sum and the relative force error |a - a_exact|/|a_exact|
+(median, 99th percentile, max) over --sample bodies, whose exact forces are
+summed directly. Direct sums above --direct-max bodies are not run, their time
+is extrapolated as N^2 from the largest one that was (marked ~).
+"""
+
+def cluster(N, seed=0):
+    """ positions (N, 2) and masses (N,) of a gaussian cluster of stars """
+    rng = np.random.default_rng(seed)
+    positions = rng.normal(scale=1e16, size=(N, 2))
+    masses = 2e30 * 10**rng.uniform(-1, 1, N)
+    return positions, masses
+
+def direct_at(idx, positions, masses, chunk=256):
+    """ exact accelerations (len(idx), 2) of the bodies `idx` due to all bodies """
+    a = np.empty((len(idx), 2))
+    for c0 in range(0, len(idx), chunk):
+        i = idx[c0:c0 + chunk]
+        d = positions[None, :, :] - positions[i, None, :]
+        r3 = (d*d).sum(axis=-1)
+        r3 *= np.sqrt(r3)
+        s = np.divide(masses, r3, out=np.zeros_like(r3), where=r3 > 0)
+        a[c0:c0 + chunk] = G * np.einsum('ij,ijk->ik', s, d)
+    return a
+
+def timed(call, min_time=0.0):
+    """ (result, seconds per call) of `call`, repeated for at least min_time """
+    n, start = 0, time.perf_counter()
+    while True:
+        result = call()
+        n += 1
+        seconds = time.perf_counter() - start
+        if seconds >= min_time:
+            return result, seconds / n
+
+def report(N, thetas, leaf_size=8, sample=1000, direct_max=20000, direct_ref=None, min_time=0.2, seed=0):
+    """ rows of the report for one N; direct_ref = (N, seconds) of an earlier direct sum to extrapolate from """
+    positions, masses = cluster(N, seed)
+    idx = np.random.default_rng(seed + 1).choice(N, size=min(sample, N), replace=False)
+    exact = direct_at(idx, positions, masses)
+    norm = np.linalg.norm(exact, axis=1)
+
+    if N <= direct_max:
+        _, t_direct = timed(lambda: pairwise_accelerations(positions, masses), min_time)
+        estimated = False
+    else:
+        t_direct = direct_ref[1] * (N / direct_ref[0])**2 if direct_ref else float('nan')
+        estimated = True
+    rows = [{'N': N, 'engine': 'direct', 'theta': None, 'build': 0.0, 'force': t_direct, 'seconds': t_direct,
+             'estimated': estimated, 'speedup': 1.0, 'median': 0.0, 'p99': 0.0, 'max': 0.0}]
+
+    for theta in thetas:
+        tree, t_build = timed(lambda: QuadTree(positions, masses, leaf_size=leaf_size), min_time)
+        a, t_force = timed(lambda: tree.accelerations(positions, theta=theta), min_time)
+        err = np.linalg.norm(a[idx] - exact, axis=1) / norm
+        seconds = t_build + t_force
+        rows.append({'N': N, 'engine': 'barnes-hut', 'theta': theta, 'build': t_build, 'force': t_force,
+                     'seconds': seconds, 'estimated': False, 'speedup': t_direct / seconds,
+                     'median': float(np.median(err)), 'p99': float(np.percentile(err, 99)), 'max': float(err.max())})
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Barnes-Hut accuracy vs speed report")
+    parser.add_argument('--N', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--theta', type=float, nargs='+', default=[0.3, 0.5, 0.7, 1.0])
+    parser.add_argument('--leaf-size', type=int, default=8, help="max bodies per tree leaf")
+    parser.add_argument('--sample', type=int, default=1000, help="bodies the force error is measured on")
+    parser.add_argument('--direct-max', type=int, default=20000, help="largest N the direct sum is timed at")
+    parser.add_argument('--min-time', type=float, default=0.2, help="seconds each measurement is repeated for")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    rows, direct_ref = [], None
+    print(f"{'N':>8} {'engine':>10} {'theta':>5} {'build s':>9} {'force s':>9} {'speedup':>8} "
+          f"{'median err':>10} {'p99 err':>9} {'max err':>9}")
+    for N in sorted(args.N):
+        for row in report(N, args.theta, leaf_size=args.leaf_size, sample=args.sample, direct_max=args.direct_max,
+                          direct_ref=direct_ref, min_time=args.min_time, seed=args.seed):
+            rows.append(row)
+            if row['engine'] == 'direct' and not row['estimated']:
+                direct_ref = (N, row['seconds'])
+            theta = '' if row['theta'] is None else f"{row['theta']:.2f}"
+            force = ('~' if row['estimated'] else '') + f"{row['force']:.4f}"
+            print(f"{N:>8} {row['engine']:>10} {theta:>5} {row['build']:>9.4f} {force:>9} {row['speedup']:>8.1f} "
+                  f"{row['median']:>10.2e} {row['p99']:>9.2e} {row['max']:>9.2e}")
+
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump({'runs': rows}, f, indent=2)
+
+    return 0
+
+if __name__ == "__main__":
+    main()
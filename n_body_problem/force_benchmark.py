@@ -0,0 +1,135 @@
+import argparse
+import json
+import os
+import platform
+import time
+import numpy as np
+from system import TILE, Body, gravitational_force, pairwise_accelerations
+
+"""
+Benchmark of the direct-sum force kernels
+
+    python force_benchmark.py --N 100 1000 10000 30000 --json forces.json
+
+    loop        the original double loop over Body pairs with gravitational_force
+    broadcast   one NumPy expression over the full (N, N, 2) pair differences
+    numpy       the tiled upper-triangle kernel of the direct engine (pairwise_accelerations)
+    numba-1     the compiled kernel on one thread
+    numba       the compiled kernel on all threads (numba's default)
+
+Per kernel and N it prints the time per force evaluation, the pair
+interactions per second, the speedup over the numpy kernel and the memory
+the kernel allocates on top of its result. The loop and broadcast kernels
+are skipped above --loop-max and --broadcast-max bodies, the numba ones when
+numba is not installed; compile time is excluded and printed once.
+"""
+
+def loop_accelerations(positions, masses):
+    """ the original update_bodies force loop, as accelerations """
+    bodies = [Body(x, [0, 0], m, 0) for x, m in zip(positions, masses)]
+    forces = [np.zeros(2) for _ in bodies]
+    for i, body1 in enumerate(bodies):
+        for j, body2 in enumerate(bodies):
+            if i != j:
+                forces[i] += gravitational_force(body1, body2)
+    return np.array(forces) / masses[:, None]
+
+def broadcast_accelerations(positions, masses, G=6.67430e-11):
+    """ all pairs at once, (N, N, 2) temporaries """
+    d = positions[None, :, :] - positions[:, None, :]
+    r2 = (d*d).sum(axis=-1)
+    r3 = r2 * np.sqrt(r2)
+    s = np.divide(masses[None, :], r3, out=np.zeros_like(r3), where=r3 > 0)
+    return G * (s[:, :, None] * d).sum(axis=1)
+
+def kernels(args):
+    """ {name: (accelerations(positions, masses), largest N)} of the available kernels """
+    found = {'loop': (loop_accelerations, args.loop_max),
+             'broadcast': (broadcast_accelerations, args.broadcast_max),
+             'numpy': (pairwise_accelerations, None)}
+    try:
+        from numba_kernel import compiled_kernel, numba_accelerations
+        start = time.perf_counter()
+        compiled_kernel()
+        numba_accelerations(np.random.rand(4, 2), np.ones(4), threads=1)
+        print(f"[INFO]: numba kernel compiled (or loaded from cache) in {time.perf_counter() - start:.2f} s")
+        found['numba-1'] = (lambda x, m: numba_accelerations(x, m, threads=1), None)
+        found['numba'] = (numba_accelerations, None)
+    except ImportError as e:
+        print(f"[INFO]: skipping the numba kernels: {e}")
+    return found
+
+def time_call(call, min_time=0.2):
+    """ seconds per call of `call`, repeated for at least min_time """
+    call()
+    n, start = 0, time.perf_counter()
+    while True:
+        call()
+        n += 1
+        seconds = time.perf_counter() - start
+        if seconds >= min_time:
+            return seconds / n
+
+def extra_memory(name, N):
+    """ bytes the kernel allocates on top of the (N, 2) result, from its temporaries """
+    if name == 'loop':
+        return N * 3 * 16
+    if name == 'broadcast':
+        return N * N * 8 * 5  # d (2 N^2), r2, r3, s
+    if name == 'numpy':
+        return TILE * TILE * 8 * 4  # dx, dy, s, r3 of one tile
+    import numba
+    threads = 1 if name == 'numba-1' else numba.get_num_threads()
+    return threads * N * 2 * 8
+
+def environment():
+    """ versions and machine the benchmark ran on """
+    env = {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+           'processor': platform.processor(), 'cpus': os.cpu_count()}
+    try:
+        import numba
+        env['numba'] = numba.__version__
+        env['numba_threads'] = numba.get_num_threads()
+    except ImportError:
+        pass
+    return env
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="direct-sum force kernel benchmark")
+    parser.add_argument('--N', type=int, nargs='+', default=[100, 1000, 10000, 30000])
+    parser.add_argument('--loop-max', type=int, default=300, help="largest N for the python loop")
+    parser.add_argument('--broadcast-max', type=int, default=10000, help="largest N for the (N, N, 2) broadcast")
+    parser.add_argument('--min-time', type=float, default=0.2, help="seconds each kernel is repeated for")
+    parser.add_argument('--json', help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    found = kernels(args)
+    rng = np.random.default_rng(0)
+    runs = []
+    print(f"{'N':>7} {'kernel':>10} {'ms':>10} {'pairs/s':>9} {'vs numpy':>9} {'extra MB':>9}")
+    for N in args.N:
+        positions = rng.normal(scale=1e11, size=(N, 2))
+        masses = rng.uniform(1e22, 1e24, N)
+        reference = pairwise_accelerations(positions, masses)
+        results = {}
+        for name, (kernel, largest) in found.items():
+            if largest is not None and N > largest:
+                continue
+            error = np.abs(kernel(positions, masses) - reference).max() / np.abs(reference).max()
+            seconds = time_call(lambda: kernel(positions, masses), args.min_time)
+            results[name] = {'N': N, 'kernel': name, 'seconds': seconds, 'pairs_per_second': N*(N-1) / seconds,
+                             'extra_bytes': extra_memory(name, N), 'error': float(error)}
+        for name, r in results.items():
+            r['speedup'] = results['numpy']['seconds'] / r['seconds']
+            runs.append(r)
+            print(f"{N:>7} {name:>10} {r['seconds']*1e3:>10.3f} {r['pairs_per_second']:>9.2e} {r['speedup']:>9.2f} "
+                  f"{r['extra_bytes']/2**20:>9.1f}")
+
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump({'environment': environment(), 'runs': runs}, f, indent=2)
+
+    return 0
+
+if __name__ == "__main__":
+    main()
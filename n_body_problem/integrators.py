@@ -0,0 +1,163 @@
+import numpy as np
+from system import accelerations_jerks
+
+"""
+Time integrators of the N-body System
+
+    euler      semi-implicit (symplectic) Euler, kick then drift: the original
+               update_bodies scheme, 1st order, 1 force evaluation per step
+    leapfrog   kick-drift-kick leapfrog (velocity Verlet), 2nd order,
+               1 force evaluation per step
+    yoshida4   Yoshida's 4th order triple jump of three leapfrog steps of
+               w1*dt, w0*dt, w1*dt, 3 force evaluations per step
+    block      kick-drift-kick leapfrog with individual power-of-two
+               timesteps dt/2^k per body (block timesteps), forces only
+               recomputed for the bodies ending a step
+
+The first three are symplectic, so the energy error oscillates instead of drifting
+away, and the leapfrogs are also time reversible. The leapfrogs reuse the
+accelerations of the end of the last step as long as the positions and masses
+they were computed for are unchanged.
+"""
+
+class Euler:
+    """ system.step, kick with the current forces then drift """
+    force_evaluations = 1
+
+    def __init__(self, system):
+        self.system = system
+
+    def step(self, dt):
+        self.system.step(dt)
+
+class Leapfrog:
+    """ kick-drift-kick: v += a dt/2, x += v dt, a = a(x), v += a dt/2 """
+    force_evaluations = 1
+
+    def __init__(self, system):
+        self.system = system
+        self._a = None
+        self._key = None
+
+    def accelerations(self):
+        """ accelerations at the current positions, cached from the last step when still valid """
+        s = self.system
+        if self._a is None or not (np.array_equal(self._key[0], s.positions) and np.array_equal(self._key[1], s.masses)):
+            self._a = s.accelerations(out=self._a if self._a is not None and self._a.shape == s.positions.shape else None)
+            self._key = (s.positions.copy(), s.masses.copy())
+        return self._a
+
+    def kdk(self, dt):
+        """ one kick-drift-kick step of dt """
+        s = self.system
+        s.velocities += self.accelerations() * (dt/2)
+        s.positions += s.velocities * dt
+        self._a = s.accelerations(out=self._a)
+        self._key = (s.positions.copy(), s.masses.copy())
+        s.velocities += self._a * (dt/2)
+
+    def step(self, dt):
+        self.kdk(dt)
+
+class Yoshida4(Leapfrog):
+    """ Yoshida (1990) 4th order: leapfrog steps of w1 dt, w0 dt, w1 dt with
+    w1 = 1/(2 - 2^(1/3)), w0 = 1 - 2 w1 (the middle step goes backwards) """
+    force_evaluations = 3
+    w1 = 1 / (2 - 2**(1/3))
+    w0 = 1 - 2*w1
+
+    def step(self, dt):
+        for w in (self.w1, self.w0, self.w1):
+            self.kdk(w*dt)
+
+class BlockTimestep:
+    """ hierarchical block timesteps: step(dt) advances all bodies by dt, body i
+    in substeps of dt/2^k_i, k_i <= max_level, picked from its acceleration and
+    jerk as the largest power of two below eta*|a|/|da/dt|
+
+    Time runs in ticks of dt/2^max_level. A body ending its substep at tick T
+    gets its closing kick with forces at the current positions, a new level,
+    and the opening kick of its next substep; the new substep must start on a
+    multiple of its length (so blocks stay synchronized) and is halved until
+    it does. Between these events all bodies drift. Forces and jerks are the
+    exact direct sum (accelerations_jerks) on the bodies ending a substep only,
+    `evaluations` counts them in units of N bodies. """
+
+    def __init__(self, system, eta=0.02, max_level=12):
+        self.system = system
+        self.eta = eta
+        self.max_level = max_level
+        self.evaluations = 0.0
+        self.steps = 0
+        self.deepest = 0  # deepest level used so far
+        self.level = None
+        self._a = None
+        self._dt = None
+
+    @property
+    def force_evaluations(self):
+        """ force evaluations of all N bodies per step, on average so far """
+        return self.evaluations / max(self.steps, 1)
+
+    def forces(self, idx):
+        """ accelerations and jerks of the bodies idx, counted in `evaluations` """
+        s = self.system
+        self.evaluations += len(idx) / len(s)
+        return accelerations_jerks(idx, s.positions, s.velocities, s.masses, G=s.G)
+
+    def levels(self, a, j, dt):
+        """ level k of the largest step dt/2^k below eta*|a|/|j| """
+        a, j = np.linalg.norm(a, axis=1), np.linalg.norm(j, axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            k = np.ceil(np.log2(dt * j / (self.eta * a)))
+        k = np.where(np.isnan(k), 0, k)  # a = j = 0: free body
+        return np.clip(k, 0, self.max_level).astype(np.int64)
+
+    def step(self, dt):
+        s = self.system
+        N, K = len(s), self.max_level
+        if self._a is None or len(self._a) != N or self._dt != dt:
+            self._a, j = self.forces(np.arange(N))
+            self.level = self.levels(self._a, j, dt)
+            self.deepest = max(self.deepest, int(self.level.max()))
+            self._dt = dt
+        h = dt / 2**K
+        length = 2**(K - self.level)  # substep of every body in ticks
+        s.velocities += self._a * (length * h / 2)[:, None]
+        end = length.copy()
+        T = 0
+        while T < 2**K:
+            T_next = end.min()
+            s.positions += s.velocities * ((T_next - T) * h)
+            T = T_next
+            idx = np.flatnonzero(end == T)
+            a, j = self.forces(idx)
+            s.velocities[idx] += a * (length[idx] * h / 2)[:, None]
+            level = self.levels(a, j, dt)
+            # the next substep has to start on a multiple of its length
+            while True:
+                misaligned = T % 2**(K - level) != 0
+                if not misaligned.any():
+                    break
+                level[misaligned] += 1
+            self._a[idx] = a
+            self.level[idx] = level
+            self.deepest = max(self.deepest, int(level.max()))
+            length[idx] = 2**(K - level)
+            if T < 2**K:
+                s.velocities[idx] += a * (length[idx] * h / 2)[:, None]
+                end[idx] = T + length[idx]
+        self.steps += 1
+
+INTEGRATORS = {
+    'euler':    Euler,
+    'leapfrog': Leapfrog,
+    'yoshida4': Yoshida4,
+    'block':    BlockTimestep,
+}
+
+def get_integrator(name, system, **options):
+    """ return the integrator `name` of INTEGRATORS, stepping `system`; options go to its constructor """
+    if name not in INTEGRATORS:
+        raise ValueError(f"unknown integrator '{name}', choose from {sorted(INTEGRATORS)}")
+    return INTEGRATORS[name](system, **options)
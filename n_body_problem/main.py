@@ -1,50 +1,13 @@
 # n_body_simulation.py
 
-import numpy as np
+import argparse
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
-
-G = 6.67430e-11  # Gravitational constant
-
-class Body:
-    def __init__(self, position, velocity, mass, radius):
-        self.position = np.array(position, dtype='float64')
-        self.velocity = np.array(velocity, dtype='float64')
-        self.mass = mass
-        self.radius = radius
-
-    def update_position(self, dt):
-        self.position += self.velocity * dt
-
-    def update_velocity(self, force, dt):
-        self.velocity += force / self.mass * dt
-    
-    def check_collision(self, other):
-        distance = np.linalg.norm(self.position - other.position)
-        return distance < self.radius + other.radius
-
-    
-
-def gravitational_force(body1, body2):
-    distance = body2.position - body1.position
-    r = np.linalg.norm(distance)
-    if r == 0:
-        return np.zeros(2)  # Avoid division by zero
-    force_magnitude = G * body1.mass * body2.mass / r**2
-    force_direction = distance / r
-    return force_magnitude * force_direction
-
-def update_bodies(bodies, dt):
-    forces = [np.zeros(2) for _ in bodies]
-    for i, body1 in enumerate(bodies):
-        for j, body2 in enumerate(bodies):
-            if i != j:
-                forces[i] += gravitational_force(body1, body2)
-            # if body1.check_collision(body2):
-            #     print(f'Collision between {i} and {j}')
-    for i, body in enumerate(bodies):
-        body.update_velocity(forces[i], dt)
-        body.update_position(dt)
+from collisions import RESPONSES, Collisions
+from integrators import INTEGRATORS, get_integrator
+from monitor import ConservationMonitor
+from system import ENGINES, Body, System, get_engine
+from system import G, gravitational_force, update_bodies  # noqa: F401, defined here before system.py, kept for `from main import ...`
 
 # Initialize bodies: position, velocity, mass
 bodies = [
@@ -55,24 +18,47 @@ bodies = [
 
 time_factor = 50
 
-# Set up the figure and axis
-fig, ax = plt.subplots()
-ax.set_xlim(-2e7, 2e7)
-ax.set_ylim(-2e7, 2e7)
-lines = [ax.plot([], [], 'o')[0] for _ in range(len(bodies))]
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="animate the N-body simulation")
+    parser.add_argument('--engine', choices=ENGINES, default='direct', help="force engine")
+    parser.add_argument('--theta', type=float, default=0.5, help="Barnes-Hut opening angle")
+    parser.add_argument('--integrator', choices=sorted(INTEGRATORS), default='euler')
+    parser.add_argument('--collisions', choices=sorted(RESPONSES), default=None, help="collision response (default: none)")
+    parser.add_argument('--time-factor', type=float, default=time_factor, help="hours per frame")
+    args = parser.parse_args(argv)
+
+    engine = get_engine(args.engine, theta=args.theta)
+    system = System.from_bodies(bodies, engine=engine)  # bodies are views of `system` from here on
+    stepper = get_integrator(args.integrator, system)
+    collisions = None if args.collisions is None else Collisions(args.collisions)
+    monitor = ConservationMonitor(system)
+    monitor.record(0.0)
+
+    # Set up the figure and axis
+    fig, ax = plt.subplots()
+    ax.set_xlim(-2e7, 2e7)
+    ax.set_ylim(-2e7, 2e7)
+    points, = ax.plot([], [], 'o')
+    drift = ax.text(0.02, 0.95, '', transform=ax.transAxes)
+
+    def init():
+        points.set_data([], [])
+        drift.set_text('')
+        return points, drift
 
-def init():
-    for line in lines:
-        line.set_data([], [])
-    return lines
+    def animate(frame, time_factor=args.time_factor):
+        stepper.step(dt=time_factor*3600)  # Update every hour
+        if collisions is not None:
+            collisions(system)
+        dE, dL = monitor.record(monitor.t[-1] + time_factor*3600)
+        points.set_data(system.positions[:, 0], system.positions[:, 1])
+        drift.set_text(f"dE/E = {dE:.1e}, dL/L = {dL:.1e}")
+        return points, drift
 
-def animate(frame, time_factor=time_factor):
-    update_bodies(bodies, dt=time_factor*3600)  # Update every hour
-    for i, body in enumerate(bodies):
-        lines[i].set_data([body.position[0]], [body.position[1]])
-    return lines
+    # Create animation (keep the reference, a garbage collected animation stops)
+    ani = FuncAnimation(fig, animate, frames=1000, init_func=init, interval=20, blit=True)  # noqa: F841
 
-# Create animation
-ani = FuncAnimation(fig, animate, frames=1000, init_func=init, interval=20, blit=True)
+    plt.show()
 
-plt.show()
+if __name__ == "__main__":
+    main()
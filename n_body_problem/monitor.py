@@ -0,0 +1,44 @@
+import numpy as np
+
+"""
+Energy and angular momentum bookkeeping of an N-body run
+
+The monitor records t, the total energy E and the angular momentum L of a
+System whenever it is called, and reports their drift relative to the first
+record, |E - E0|/|E0| and |L - L0|/|L0|. Kinetic energy and L are O(N); the
+potential energy is an exact O(N^2) tiled direct sum, so for large N record
+only every few steps.
+"""
+
+class ConservationMonitor:
+    """ history of (t, E, L) of `system` """
+
+    def __init__(self, system):
+        self.system = system
+        self.t, self.E, self.L = [], [], []
+
+    def record(self, t):
+        """ append the current energy and angular momentum at time t, return their relative drift """
+        self.t.append(t)
+        self.E.append(self.system.energy())
+        self.L.append(self.system.angular_momentum())
+        return self.drift()
+
+    def drift(self):
+        """ (dE, dL) of the last record relative to the first """
+        return relative_drift([self.E[0], self.E[-1]])[-1], relative_drift([self.L[0], self.L[-1]])[-1]
+
+    def max_drift(self):
+        """ (max dE, max dL) over the history """
+        return relative_drift(self.E).max(), relative_drift(self.L).max()
+
+    def history(self):
+        """ the records as arrays {'t', 'E', 'L', 'dE', 'dL'} """
+        return {'t': np.array(self.t), 'E': np.array(self.E), 'L': np.array(self.L),
+                'dE': relative_drift(self.E), 'dL': relative_drift(self.L)}
+
+def relative_drift(values):
+    """ |v - v0|/|v0| of a series, the absolute change if v0 == 0 """
+    values = np.asarray(values, dtype='float64')
+    scale = abs(values[0]) if values[0] != 0 else 1.0
+    return np.abs(values - values[0]) / scale
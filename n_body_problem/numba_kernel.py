@@ -0,0 +1,91 @@
+import numpy as np
+from system import G, TILE
+
+"""
+Compiled direct-sum force kernel (optional, needs numba)
+
+Same result as pairwise_accelerations, but as explicit loops compiled by
+numba: no N x N temporaries at all, only the (N, 2) accelerations of every
+thread. The tile pairs (I, J), I <= J, of the upper triangle of the pair
+matrix are dealt out round robin to the threads (prange), every pair is
+evaluated once and applied to both bodies (Newton's third law), and the
+per-thread accelerations are summed at the end. The kernel is compiled on
+first use (and cached on disk) with fastmath, which lets the inner loop be
+vectorized; results agree with the NumPy kernel to ~1e-15.
+"""
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+def _kernel(x, y, m, tile_i, tile_j, tile, nthreads, G, out):
+    N = len(m)
+    acc = np.zeros((nthreads, N, 2))
+    for t in numba.prange(nthreads):
+        for p in range(t, len(tile_i), nthreads):
+            i0, j0 = tile_i[p] * tile, tile_j[p] * tile
+            i1, j1 = min(i0 + tile, N), min(j0 + tile, N)
+            for i in range(i0, i1):
+                xi, yi, mi = x[i], y[i], m[i]
+                axi, ayi = 0.0, 0.0
+                for j in range(i + 1 if i0 == j0 else j0, j1):
+                    dx = x[j] - xi
+                    dy = y[j] - yi
+                    r2 = dx*dx + dy*dy
+                    if r2 > 0:
+                        s = 1.0 / (r2 * np.sqrt(r2))
+                        axi += m[j] * s * dx
+                        ayi += m[j] * s * dy
+                        acc[t, j, 0] -= mi * s * dx
+                        acc[t, j, 1] -= mi * s * dy
+                acc[t, i, 0] += axi
+                acc[t, i, 1] += ayi
+    for i in numba.prange(N):
+        for d in range(2):
+            a = 0.0
+            for t in range(nthreads):
+                a += acc[t, i, d]
+            out[i, d] = G * a
+    return out
+
+_compiled = None
+
+def compiled_kernel():
+    """ the kernel compiled with numba, ImportError if numba is missing """
+    global _compiled
+    if numba is None:
+        raise ImportError("the numba force engine needs numba (pip install numba)")
+    if _compiled is None:
+        _compiled = numba.njit(parallel=True, fastmath=True, cache=True)(_kernel)
+    return _compiled
+
+def numba_accelerations(positions, masses, G=G, tile=TILE, threads=None, out=None):
+    """ direct-sum accelerations (N, 2) like pairwise_accelerations, compiled and on
+    `threads` threads (default: numba's default, all cores) """
+    kernel = compiled_kernel()
+    N = len(masses)
+    n_tiles = (N + tile - 1) // tile
+    tile_i, tile_j = np.triu_indices(n_tiles)
+    threads = numba.get_num_threads() if threads is None else threads
+    out = np.empty((N, 2)) if out is None else out
+    positions = np.asarray(positions, dtype='float64')
+    masses = np.ascontiguousarray(masses, dtype='float64')
+    x, y = np.ascontiguousarray(positions[:, 0]), np.ascontiguousarray(positions[:, 1])
+    previous = numba.get_num_threads()
+    numba.set_num_threads(threads)
+    try:
+        return kernel(x, y, masses, tile_i, tile_j, tile, threads, G, out)
+    finally:
+        numba.set_num_threads(previous)
+
+class NumbaDirect:
+    """ exact direct-sum force engine, compiled with numba """
+    name = 'numba'
+
+    def __init__(self, threads=None):
+        compiled_kernel()
+        self.threads = threads
+
+    def accelerations(self, positions, masses, G=G, out=None):
+        return numba_accelerations(positions, masses, G=G, threads=self.threads, out=out)
@@ -0,0 +1,123 @@
+import argparse
+import inspect
+import os
+import time
+import numpy as np
+from collisions import RESPONSES, Collisions
+from integrators import INTEGRATORS, get_integrator
+from monitor import ConservationMonitor
+from scenarios import SCENARIOS, YEAR, get_scenario, load_scenario
+from system import ENGINES, get_engine
+from trajectory import open_trajectory_writer
+
+"""
+Headless N-body run, as fast as the force engine allows
+
+    python run.py --scenario sun-earth-jupiter --steps 100000 --every 10 --dt-hours 24 -o trajectory.npy
+    python run.py --scenario plummer --N 100000 --engine barnes-hut --dt-years 1000 -o plummer.h5
+    python run.py --scenario galaxies.yaml --engine barnes-hut --dt-years 1000 -o galaxies.npy
+    python run.py --scenario cluster --N 500 --radius 3e14 --collisions merge --dt-years 2000 -o merging.npy
+    python view.py trajectory.npy
+
+--scenario is one of the named scenarios or a scenario file (.npz/.csv/.yaml),
+--N, --seed and --radius go to the generators. Generated bodies are points
+(radius 0) unless --radius is given, so --collisions needs --radius or radii
+from a scenario file.
+Positions are written every --every steps (and after the last step) to a
+(frames, N, 2) .npy memmap or .h5 file, the first frame being the initial
+state; bodies removed by --collisions merge are NaN from then on. The
+viewer replays the file, so nothing here waits on matplotlib.
+"""
+
+def count_frames(steps, every):
+    """ frames a run of `steps` writes: the initial state, every `every` steps and the last step """
+    return 1 + steps // every + (steps % every != 0)
+
+def frame(system, n_bodies):
+    """ positions (n_bodies, 2) of the initial bodies, NaN for those merged away """
+    if len(system) == n_bodies:
+        return system.positions
+    positions = np.full((n_bodies, 2), np.nan)
+    positions[system.ids] = system.positions
+    return positions
+
+def run(system, stepper, steps, dt, writer, every=1, monitor=None, collisions=None, progress=0):
+    """ advance `system` by `steps` steps of dt, writing its positions to `writer`
+    and handling collisions after every step """
+    n_bodies = len(system)
+    t = 0.0
+    writer.write(t, frame(system, n_bodies))
+    for i in range(steps):
+        stepper.step(dt)
+        if collisions is not None:
+            collisions(system)
+        t = (i + 1) * dt
+        if (i + 1) % every == 0 or i == steps - 1:
+            writer.write(t, frame(system, n_bodies))
+            if monitor is not None:
+                monitor.record(t)
+        if progress and (i + 1) % progress == 0:
+            print(f"[INFO]: step {i + 1}/{steps}")
+    return t
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="headless N-body run writing the trajectory to disk")
+    parser.add_argument('--scenario', default='sun-earth-jupiter', help=f"one of {sorted(SCENARIOS)} or a scenario file")
+    parser.add_argument('--N', type=int, default=None, help="bodies of a generated scenario")
+    parser.add_argument('--seed', type=int, default=None, help="random seed of a generated scenario")
+    parser.add_argument('--radius', type=float, default=None, help="body radius [m] of a generated scenario")
+    parser.add_argument('--engine', choices=ENGINES, default='direct', help="force engine")
+    parser.add_argument('--theta', type=float, default=0.5, help="Barnes-Hut opening angle")
+    parser.add_argument('--integrator', choices=sorted(INTEGRATORS), default='leapfrog')
+    parser.add_argument('--collisions', choices=sorted(RESPONSES), default=None, help="collision response (default: none)")
+    parser.add_argument('--steps', type=int, default=10000)
+    parser.add_argument('--dt-hours', type=float, default=24)
+    parser.add_argument('--dt-years', type=float, default=None, help="timestep in years, overrides --dt-hours")
+    parser.add_argument('--every', type=int, default=10, help="write positions every this many steps")
+    parser.add_argument('--float32', action='store_true', help="store positions in single precision")
+    parser.add_argument('--monitor', action='store_true', help="track the energy/angular momentum drift at every write")
+    parser.add_argument('--progress', type=int, default=0, help="print progress every this many steps")
+    parser.add_argument('-o', '--output', default='trajectory.npy', help=".npy or .h5")
+    args = parser.parse_args(argv)
+
+    engine = get_engine(args.engine, theta=args.theta)
+    if os.path.splitext(args.scenario)[1]:
+        system = load_scenario(args.scenario, engine=engine)
+    else:
+        options = {name: value for name, value in (('N', args.N), ('seed', args.seed), ('radius', args.radius))
+                   if value is not None}
+        unknown = set(options) - set(inspect.signature(SCENARIOS.get(args.scenario, get_scenario)).parameters)
+        if unknown:
+            parser.error(f"scenario '{args.scenario}' takes no {', '.join('--' + name for name in sorted(unknown))}")
+        system = get_scenario(args.scenario, engine=engine, **options)
+    stepper = get_integrator(args.integrator, system)
+    collisions = None if args.collisions is None else Collisions(args.collisions)
+    monitor = None
+    if args.monitor:
+        monitor = ConservationMonitor(system)
+        monitor.record(0.0)
+    dt = args.dt_years * YEAR if args.dt_years is not None else args.dt_hours * 3600
+    meta = {'scenario': args.scenario, 'engine': args.engine, 'theta': args.theta, 'integrator': args.integrator,
+            'collisions': args.collisions or 'none', 'dt': dt, 'every': args.every, 'steps': args.steps}
+
+    n_bodies = len(system)
+    n_frames = count_frames(args.steps, args.every)
+    dtype = 'float32' if args.float32 else 'float64'
+    start = time.perf_counter()
+    with open_trajectory_writer(args.output, n_bodies, n_frames, dtype=dtype, meta=meta) as writer:
+        run(system, stepper, args.steps, dt, writer, every=args.every, monitor=monitor, collisions=collisions,
+            progress=args.progress)
+    seconds = time.perf_counter() - start
+
+    if collisions is not None:
+        print(f"[INFO]: {collisions.count} collisions ({args.collisions}), {len(system)} bodies left")
+    print(f"[INFO]: {args.steps} steps of {n_bodies} bodies in {seconds:.2f} s ({args.steps/seconds:.0f} steps/s), "
+          f"{n_frames} frames written to {args.output}")
+    if monitor is not None:
+        dE, dL = monitor.max_drift()
+        print(f"[INFO]: max |dE/E| = {dE:.2e}, max |dL/L| = {dL:.2e}")
+
+    return 0
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+import argparse
+import os
+import time
+import numpy as np
+from system import G, System
+
+"""
+Initial conditions of the N-body simulation as ready Systems
+
+Named scenarios (get_scenario) are the solar system setups and generators
+of large systems, which build the position/velocity/mass/radius arrays
+directly, vectorized, without a Body per body:
+
+    plummer    Plummer sphere (Aarseth, Henon & Wielen 1974), projected onto the plane
+    disk       exponential disk on circular orbits around a central mass
+    cluster    uniform disk of equal masses with gaussian velocities at a given virial ratio
+
+Scenario files (load_scenario / save_scenario), SI units throughout:
+
+    .npz    arrays positions (N, 2), velocities (N, 2), masses (N,), radii (N,) (optional)
+    .csv    header line naming the columns x, y, vx, vy, mass and optionally radius
+    .yaml   a `bodies` list of {position, velocity, mass, radius} and/or a `generate`
+            list of named scenarios with their options plus an optional
+            position/velocity offset, for example two colliding clusters:
+
+                generate:
+                  - {scenario: plummer, N: 50000, seed: 1, position: [-3.0e17, 0], velocity: [2000, 0]}
+                  - {scenario: plummer, N: 50000, seed: 2, position: [3.0e17, 0], velocity: [-2000, 0]}
+
+Generated scenarios can be written to a file for reuse:
+
+    python scenarios.py plummer --N 1000000 -o plummer.npz
+"""
+
+AU = 1.495978707e11  # m
+YEAR = 365.25 * 86400  # s
+PC = 3.0856775814913673e16  # m
+M_SUN = 1.989e30  # kg
+
+def sun_earth_jupiter(engine=None):
+    """ Sun, Earth and Jupiter on circular orbits at their mean distances, with
+    the Sun moving so the total momentum is zero """
+    positions = [[0, 0], [1.0*AU, 0], [0, 5.2*AU]]
+    velocities = [[0, 0], [0, 29_780], [-13_070, 0]]
+    masses = [1.989e30, 5.972e24, 1.898e27]
+    radii = [696_340_000, 6_371_000, 69_911_000]
+    system = System(positions, velocities, masses, radii, engine=engine)
+    system.velocities[0] = -system.momentum() / system.masses[0]
+    return system
+
+def sun_earth_jupiter_comet(engine=None, perihelion=0.02*AU, aphelion=4*AU):
+    """ sun_earth_jupiter plus a sun-grazing comet starting at its perihelion """
+    system = sun_earth_jupiter(engine=engine)
+    a = (perihelion + aphelion) / 2
+    speed = np.sqrt(G * system.masses[0] * (2/perihelion - 1/a))
+    system = System(np.vstack([system.positions, [-perihelion, 0]]), np.vstack([system.velocities, [0, -speed]]),
+                    np.append(system.masses, 1e14), np.append(system.radii, 5e3), engine=engine)
+    system.velocities[0] = 0
+    system.velocities[0] = -system.momentum() / system.masses[0]
+    return system
+
+def _directions(rng, n, dims=3):
+    """ n isotropic unit vectors in `dims` dimensions """
+    v = rng.normal(size=(n, dims))
+    return v / np.linalg.norm(v, axis=1)[:, None]
+
+def _to_rest_frame(positions, velocities, masses):
+    """ move the centre of mass to rest at the origin, in place """
+    M = masses.sum()
+    positions -= masses @ positions / M
+    velocities -= masses @ velocities / M
+
+def plummer(N=10000, total_mass=1e4*M_SUN, scale=1*PC, radius=0.0, seed=0, engine=None):
+    """ equal-mass Plummer sphere of scale radius `scale`, sampled in 3D and projected
+    onto the simulation plane (the x, y components of positions and velocities) """
+    rng = np.random.default_rng(seed)
+    # radii from the cumulative mass, cut at 0.999 of it (r < ~22 scale)
+    r = scale / np.sqrt(rng.uniform(1e-10, 0.999, N)**(-2/3) - 1)
+    positions = r[:, None] * _directions(rng, N)
+    # speeds q*v_escape with q ~ q^2 (1 - q^2)^(7/2), by rejection
+    q = np.empty(N)
+    todo = np.arange(N)
+    while len(todo):
+        x, y = rng.uniform(0, 1, len(todo)), rng.uniform(0, 0.1, len(todo))
+        ok = y < x**2 * (1 - x**2)**3.5
+        q[todo[ok]] = x[ok]
+        todo = todo[~ok]
+    v_escape = np.sqrt(2 * G * total_mass / scale) * (1 + (r/scale)**2)**(-0.25)
+    velocities = (q * v_escape)[:, None] * _directions(rng, N)
+    positions, velocities = positions[:, :2].copy(), velocities[:, :2].copy()
+    masses = np.full(N, total_mass / N)
+    _to_rest_frame(positions, velocities, masses)
+    return System(positions, velocities, masses, np.full(N, radius), engine=engine)
+
+def disk(N=10000, total_mass=1e10*M_SUN, scale=3000*PC, central_mass=1e9*M_SUN, dispersion=0.05,
+         radius=0.0, central_radius=0.0, seed=0, engine=None):
+    """ exponential disk of N equal masses (scale length `scale`, cut at 10 scale lengths)
+    on circular orbits, plus a central body of `central_mass` if it is > 0; orbital speeds
+    are from the mass inside each radius, with a gaussian `dispersion` relative to them """
+    rng = np.random.default_rng(seed)
+    R = rng.gamma(2, scale, N)  # surface density ~ exp(-R/scale)
+    while (far := R > 10*scale).any():
+        R[far] = rng.gamma(2, scale, far.sum())
+    phi = rng.uniform(0, 2*np.pi, N)
+    unit = np.stack([np.cos(phi), np.sin(phi)], axis=1)
+    positions = R[:, None] * unit
+    m = total_mass / N
+    enclosed = central_mass + m * np.argsort(np.argsort(R))  # mass at smaller radii
+    v_circular = np.sqrt(G * enclosed / R)
+    velocities = v_circular[:, None] * np.stack([-unit[:, 1], unit[:, 0]], axis=1)
+    velocities += dispersion * v_circular[:, None] * rng.normal(size=(N, 2))
+    masses = np.full(N, m)
+    radii = np.full(N, radius)
+    if central_mass > 0:
+        positions = np.vstack([[0, 0], positions])
+        velocities = np.vstack([[0, 0], velocities])
+        masses = np.append(central_mass, masses)
+        radii = np.append(central_radius, radii)
+    _to_rest_frame(positions, velocities, masses)
+    return System(positions, velocities, masses, radii, engine=engine)
+
+def cluster(N=10000, total_mass=1e4*M_SUN, size=1*PC, virial_ratio=0.5, radius=0.0, seed=0, engine=None):
+    """ N equal masses uniform in a disk of radius `size`, gaussian velocities scaled to
+    2K/|U| = virial_ratio (1: virial equilibrium, < 1: collapsing) with the potential energy
+    of a uniform disk, U = -8 G M^2/(3 pi size) """
+    rng = np.random.default_rng(seed)
+    positions = size * np.sqrt(rng.uniform(0, 1, N))[:, None] * _directions(rng, N, dims=2)
+    velocities = rng.normal(size=(N, 2))
+    masses = np.full(N, total_mass / N)
+    _to_rest_frame(positions, velocities, masses)
+    U = -8 * G * total_mass**2 / (3 * np.pi * size)
+    K = 0.5 * masses @ (velocities**2).sum(axis=1)
+    velocities *= np.sqrt(virial_ratio * abs(U) / (2 * K)) if K > 0 else 0
+    return System(positions, velocities, masses, np.full(N, radius), engine=engine)
+
+SCENARIOS = {
+    'sun-earth-jupiter': sun_earth_jupiter,
+    'sun-earth-jupiter-comet': sun_earth_jupiter_comet,
+    'plummer': plummer,
+    'disk': disk,
+    'cluster': cluster,
+}
+
+def get_scenario(name, engine=None, **options):
+    """ return the System of the scenario `name` of SCENARIOS, options go to its function """
+    if name not in SCENARIOS:
+        raise ValueError(f"unknown scenario '{name}', choose from {sorted(SCENARIOS)}")
+    return SCENARIOS[name](engine=engine, **options)
+
+def _concatenate(parts, engine=None):
+    """ one System of the (positions, velocities, masses, radii) array tuples `parts` """
+    return System(*(np.concatenate([np.reshape(p[k], (-1, 2) if k < 2 else (-1,)) for p in parts]) for k in range(4)),
+                  engine=engine)
+
+_YAML_FLOAT = r'''^(?:[-+]?(?:[0-9][0-9_]*)\.[0-9_]*(?:[eE][-+]?[0-9]+)?
+    |[-+]?(?:[0-9][0-9_]*)(?:[eE][-+]?[0-9]+)
+    |\.[0-9_]+(?:[eE][-+]?[0-9]+)?
+    |[-+]?\.(?:inf|Inf|INF)
+    |\.(?:nan|NaN|NAN))$'''
+
+def _load_yaml(path, engine=None):
+    import re
+    import yaml
+
+    class Loader(yaml.SafeLoader):
+        """ safe loader that also reads 1.0e34 and 3e16 as floats (YAML 1.1 wants 1.0e+34) """
+
+    Loader.yaml_implicit_resolvers = {key: [r for r in resolvers if r[0] != 'tag:yaml.org,2002:float']
+                                      for key, resolvers in yaml.SafeLoader.yaml_implicit_resolvers.items()}
+    Loader.add_implicit_resolver('tag:yaml.org,2002:float', re.compile(_YAML_FLOAT, re.X), list('-+0123456789.'))
+    with open(path) as f:
+        spec = yaml.load(f, Loader=Loader) or {}
+    parts = []
+    for options in spec.get('generate', []):
+        options = dict(options)
+        name = options.pop('scenario')
+        offset = np.asarray(options.pop('position', (0, 0)), dtype='float64')
+        drift = np.asarray(options.pop('velocity', (0, 0)), dtype='float64')
+        s = get_scenario(name, **options)
+        parts.append((s.positions + offset, s.velocities + drift, s.masses, s.radii))
+    bodies = spec.get('bodies', [])
+    if bodies:
+        parts.append((np.array([b['position'] for b in bodies], dtype='float64'),
+                      np.array([b.get('velocity', (0, 0)) for b in bodies], dtype='float64'),
+                      np.array([b['mass'] for b in bodies], dtype='float64'),
+                      np.array([b.get('radius', 0) for b in bodies], dtype='float64')))
+    if not parts:
+        raise ValueError(f"{path} has neither 'bodies' nor 'generate' entries")
+    return _concatenate(parts, engine=engine)
+
+def load_scenario(path, engine=None):
+    """ return the System stored in the scenario file `path` (.npz, .csv or .yaml) """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.npz':
+        with np.load(path) as data:
+            radii = data['radii'] if 'radii' in data.files else np.zeros(len(data['masses']))
+            return System(data['positions'], data['velocities'], data['masses'], radii, engine=engine)
+    if ext == '.csv':
+        with open(path) as f:
+            columns = [c.strip() for c in f.readline().split(',')]
+        data = np.loadtxt(path, delimiter=',', skiprows=1, ndmin=2)
+        col = {name: data[:, i] for i, name in enumerate(columns)}
+        missing = {'x', 'y', 'vx', 'vy', 'mass'} - set(col)
+        if missing:
+            raise ValueError(f"{path} is missing the columns {sorted(missing)}")
+        radii = col.get('radius', np.zeros(len(data)))
+        return System(np.stack([col['x'], col['y']], axis=1), np.stack([col['vx'], col['vy']], axis=1),
+                      col['mass'], radii, engine=engine)
+    if ext in ('.yaml', '.yml'):
+        return _load_yaml(path, engine=engine)
+    raise ValueError(f"don't know how to read a scenario from '{path}' (use .npz, .csv or .yaml)")
+
+def save_scenario(path, system):
+    """ write the bodies of `system` to `path` (.npz or .csv) """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.npz':
+        np.savez(path, positions=system.positions, velocities=system.velocities, masses=system.masses,
+                 radii=system.radii)
+    elif ext == '.csv':
+        data = np.column_stack([system.positions, system.velocities, system.masses, system.radii])
+        np.savetxt(path, data, delimiter=',', header='x,y,vx,vy,mass,radius', comments='', fmt='%.17g')
+    else:
+        raise ValueError(f"don't know how to write a scenario to '{path}' (use .npz or .csv)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="write a named N-body scenario to a scenario file")
+    parser.add_argument('scenario', choices=sorted(SCENARIOS))
+    parser.add_argument('--N', type=int, default=None, help="bodies of a generated scenario")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('-o', '--output', required=True, help=".npz or .csv")
+    args = parser.parse_args(argv)
+
+    options = {name: value for name, value in (('N', args.N), ('seed', args.seed)) if value is not None}
+    start = time.perf_counter()
+    system = get_scenario(args.scenario, **options)
+    seconds = time.perf_counter() - start
+    save_scenario(args.output, system)
+    print(f"[INFO]: generated {len(system)} bodies in {seconds:.2f} s, wrote {args.output}")
+
+    return 0
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+import numpy as np
+
+"""
+Structure-of-arrays state of an N-body system
+
+All bodies live in four contiguous arrays
+
+    positions   (N, 2)  m
+    velocities  (N, 2)  m/s
+    masses      (N,)    kg
+    radii       (N,)    m
+
+and forces are computed for all of them at once by a force engine
+
+    direct       exact tiled direct sum (pairwise_accelerations), O(N^2)
+    barnes-hut   quadtree approximation with opening angle theta, O(N log N)
+    numba        the direct sum compiled and multi-threaded, needs numba
+
+`Body` is kept as the per-body API, a Body belonging to a System is only a
+view into its arrays, so changing one changes the other.
+"""
+
+G = 6.67430e-11  # Gravitational constant
+
+TILE = 128  # bodies per tile of the pairwise kernel, tile temporaries stay in cache
+
+def pairwise_accelerations(positions, masses, G=G, tile=TILE, out=None):
+    """ direct-sum gravitational accelerations (N, 2) of all bodies on each other
+
+    The pair matrix is done in tile x tile blocks over the upper triangle only:
+    each block is evaluated once and, by Newton's third law, applied to both
+    the i and the j bodies. Coincident bodies (r == 0) don't interact. """
+    N = len(masses)
+    a = np.zeros((N, 2)) if out is None else out
+    a[...] = 0
+    x, y = positions[:, 0], positions[:, 1]
+    for i0 in range(0, N, tile):
+        i1 = min(i0 + tile, N)
+        for j0 in range(i0, N, tile):
+            j1 = min(j0 + tile, N)
+            dx = x[None, j0:j1] - x[i0:i1, None]
+            dy = y[None, j0:j1] - y[i0:i1, None]
+            s = dx*dx
+            s += dy*dy
+            r3 = np.sqrt(s)
+            r3 *= s
+            np.divide(1, r3, out=s, where=r3 > 0)  # s = 1/r^3, 0 on the diagonal
+            dx *= s
+            dy *= s
+            a[i0:i1, 0] += dx @ masses[j0:j1]
+            a[i0:i1, 1] += dy @ masses[j0:j1]
+            if j0 != i0:
+                a[j0:j1, 0] -= masses[i0:i1] @ dx
+                a[j0:j1, 1] -= masses[i0:i1] @ dy
+    a *= G
+    return a
+
+def accelerations_jerks(idx, positions, velocities, masses, G=G, chunk=TILE):
+    """ accelerations and jerks (da/dt), both (len(idx), 2), of the bodies `idx` due to all bodies,
+    direct sum in chunks of targets, for integrators that only update some bodies """
+    a = np.empty((len(idx), 2))
+    j = np.empty((len(idx), 2))
+    for c0 in range(0, len(idx), chunk):
+        i = idx[c0:c0 + chunk]
+        dx = positions[None, :, 0] - positions[i, None, 0]
+        dy = positions[None, :, 1] - positions[i, None, 1]
+        dvx = velocities[None, :, 0] - velocities[i, None, 0]
+        dvy = velocities[None, :, 1] - velocities[i, None, 1]
+        r2 = dx*dx + dy*dy
+        s = np.sqrt(r2)
+        s *= r2
+        np.divide(masses, s, out=s, where=s > 0)  # m/r^3, 0 for the body itself
+        rv = np.divide(3 * (dx*dvx + dy*dvy), r2, out=np.zeros_like(r2), where=r2 > 0)  # 3 (r.v)/r^2
+        a[c0:c0 + chunk, 0] = (s * dx).sum(axis=1)
+        a[c0:c0 + chunk, 1] = (s * dy).sum(axis=1)
+        j[c0:c0 + chunk, 0] = (s * (dvx - rv*dx)).sum(axis=1)
+        j[c0:c0 + chunk, 1] = (s * (dvy - rv*dy)).sum(axis=1)
+    return G * a, G * j
+
+def pairwise_potential(positions, masses, G=G, tile=TILE):
+    """ total gravitational potential energy -G sum_{i<j} m_i m_j / r_ij, tiled like pairwise_accelerations """
+    N = len(masses)
+    U = 0.0
+    x, y = positions[:, 0], positions[:, 1]
+    for i0 in range(0, N, tile):
+        i1 = min(i0 + tile, N)
+        for j0 in range(i0, N, tile):
+            j1 = min(j0 + tile, N)
+            dx = x[None, j0:j1] - x[i0:i1, None]
+            dy = y[None, j0:j1] - y[i0:i1, None]
+            r = np.sqrt(dx*dx + dy*dy)
+            np.divide(1, r, out=r, where=r > 0)  # 1/r, 0 for coincident bodies
+            u = masses[i0:i1] @ r @ masses[j0:j1]
+            U -= u/2 if j0 == i0 else u  # diagonal tiles hold every pair twice
+    return G * U
+
+class DirectSum:
+    """ exact direct-sum force engine """
+    name = 'direct'
+
+    def accelerations(self, positions, masses, G=G, out=None):
+        return pairwise_accelerations(positions, masses, G=G, out=out)
+
+ENGINES = ('direct', 'barnes-hut', 'numba')
+
+def get_engine(name='direct', theta=0.5, leaf_size=8, threads=None):
+    """ return a force engine by name; theta and leaf_size only apply to barnes-hut, threads to numba """
+    if name == 'direct':
+        return DirectSum()
+    if name == 'barnes-hut':
+        from barnes_hut import BarnesHut
+        return BarnesHut(theta=theta, leaf_size=leaf_size)
+    if name == 'numba':
+        from numba_kernel import NumbaDirect
+        return NumbaDirect(threads=threads)
+    raise ValueError(f"unknown force engine '{name}', choose from {ENGINES}")
+
+class System:
+    """ N bodies stored as contiguous arrays, forces by `engine` (default: direct sum) """
+
+    def __init__(self, positions, velocities, masses, radii, G=G, engine=None):
+        self.positions = np.array(positions, dtype='float64', order='C').reshape(-1, 2)
+        self.velocities = np.array(velocities, dtype='float64', order='C').reshape(-1, 2)
+        self.masses = np.array(masses, dtype='float64').reshape(-1)
+        self.radii = np.array(radii, dtype='float64').reshape(-1)
+        self.G = G
+        self.engine = DirectSum() if engine is None else engine
+        N = len(self.masses)
+        self.ids = np.arange(N)  # index of every body in the initial system, kept when bodies are removed
+        if not (len(self.positions) == len(self.velocities) == len(self.radii) == N):
+            raise ValueError(f"positions, velocities, masses and radii must describe the same number of bodies, got "
+                             f"{len(self.positions)}, {len(self.velocities)}, {N} and {len(self.radii)}")
+
+    @classmethod
+    def from_bodies(cls, bodies, G=G, engine=None):
+        """ copy `bodies` into a new System and turn them into views of it """
+        bodies = list(bodies)
+        system = cls(np.reshape([b.position for b in bodies], (-1, 2)), np.reshape([b.velocity for b in bodies], (-1, 2)),
+                     [b.mass for b in bodies], [b.radius for b in bodies], G=G, engine=engine)
+        for i, body in enumerate(bodies):
+            body._system, body._index = system, i
+        return system
+
+    @classmethod
+    def of(cls, bodies):
+        """ the System `bodies` are views of, if they are all of one in order, else System.from_bodies(bodies) """
+        bodies = list(bodies)
+        system = bodies[0]._system if bodies else None
+        if system is not None and len(system) == len(bodies) and \
+                all(b._system is system and b._index == i for i, b in enumerate(bodies)):
+            return system
+        return cls.from_bodies(bodies)
+
+    def __len__(self):
+        return len(self.masses)
+
+    def __getitem__(self, i):
+        return self.body(i)
+
+    def body(self, i):
+        """ Body view of body `i` """
+        if not -len(self) <= i < len(self):
+            raise IndexError(f"body {i} out of range for a system of {len(self)}")
+        body = Body.__new__(Body)
+        body._system, body._index = self, i % len(self)
+        return body
+
+    @property
+    def bodies(self):
+        """ Body views of all bodies """
+        return [self.body(i) for i in range(len(self))]
+
+    def keep(self, mask):
+        """ remove the bodies where `mask` is False; Body views taken before are invalid afterwards """
+        for name in ('positions', 'velocities', 'masses', 'radii', 'ids'):
+            setattr(self, name, np.ascontiguousarray(getattr(self, name)[mask]))
+
+    def accelerations(self, out=None):
+        """ gravitational accelerations (N, 2) """
+        return self.engine.accelerations(self.positions, self.masses, G=self.G, out=out)
+
+    def forces(self):
+        """ gravitational forces (N, 2) """
+        return self.masses[:, None] * self.accelerations()
+
+    def kinetic_energy(self):
+        return 0.5 * float(self.masses @ (self.velocities**2).sum(axis=1))
+
+    def potential_energy(self):
+        """ exact (direct-sum) potential energy """
+        return pairwise_potential(self.positions, self.masses, G=self.G)
+
+    def energy(self):
+        return self.kinetic_energy() + self.potential_energy()
+
+    def momentum(self):
+        return self.masses @ self.velocities
+
+    def angular_momentum(self):
+        """ z component of the total angular momentum about the origin """
+        x, v = self.positions, self.velocities
+        return float(self.masses @ (x[:, 0]*v[:, 1] - x[:, 1]*v[:, 0]))
+
+    def step(self, dt):
+        """ semi-implicit Euler step: velocities from the current forces, then positions from the new velocities """
+        self.velocities += self.accelerations() * dt
+        self.positions += self.velocities * dt
+
+class Body:
+    """ one body; created on its own it is a System of one, inside a System a view of its arrays """
+
+    def __init__(self, position, velocity, mass, radius):
+        self._system = System([position], [velocity], [mass], [radius])
+        self._index = 0
+
+    @property
+    def system(self):
+        return self._system
+
+    @property
+    def position(self):
+        return self._system.positions[self._index]
+
+    @position.setter
+    def position(self, value):
+        self._system.positions[self._index] = value
+
+    @property
+    def velocity(self):
+        return self._system.velocities[self._index]
+
+    @velocity.setter
+    def velocity(self, value):
+        self._system.velocities[self._index] = value
+
+    @property
+    def mass(self):
+        return float(self._system.masses[self._index])
+
+    @mass.setter
+    def mass(self, value):
+        self._system.masses[self._index] = value
+
+    @property
+    def radius(self):
+        return float(self._system.radii[self._index])
+
+    @radius.setter
+    def radius(self, value):
+        self._system.radii[self._index] = value
+
+    def update_position(self, dt):
+        self.position += self.velocity * dt
+
+    def update_velocity(self, force, dt):
+        self.velocity += force / self.mass * dt
+
+    def check_collision(self, other):
+        distance = np.linalg.norm(self.position - other.position)
+        return distance < self.radius + other.radius
+
+    def __repr__(self):
+        return f"Body(position={self.position.tolist()}, velocity={self.velocity.tolist()}, mass={self.mass}, radius={self.radius})"
+
+def gravitational_force(body1, body2):
+    distance = body2.position - body1.position
+    r = np.linalg.norm(distance)
+    if r == 0:
+        return np.zeros(2)  # Avoid division by zero
+    force_magnitude = G * body1.mass * body2.mass / r**2
+    force_direction = distance / r
+    return force_magnitude * force_direction
+
+def update_bodies(bodies, dt):
+    """ advance `bodies` by one semi-implicit Euler step, vectorized over their System """
+    System.of(bodies).step(dt)
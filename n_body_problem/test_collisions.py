@@ -0,0 +1,28 @@
+import numpy as np
+from collisions import bounce, find_collisions
+from scenarios import cluster
+from system import System
+
+def kinetic_energy(system):
+    return 0.5 * system.masses @ (system.velocities**2).sum(axis=1)
+
+def test_bounce_head_on_chain_of_three():
+    system = System([[0, 0], [1.5, 0], [3, 0]], [[1, 0], [0, 0], [-1, 0]], [1.0, 1.0, 1.0], [1.0, 1.0, 1.0])
+    i, j = find_collisions(system.positions, system.radii)
+    E, p = kinetic_energy(system), system.momentum()
+    assert bounce(system, i, j) > 0
+    assert np.isclose(kinetic_energy(system), E, rtol=1e-12)
+    assert np.allclose(system.momentum(), p, atol=1e-12)
+    v = system.velocities
+    assert ((v[1:, 0] - v[:-1, 0]) >= 0).all()  # nothing approaching any more
+
+def test_bounce_dense_cluster_conserves_energy_and_momentum():
+    system = cluster(N=400, radius=5e14)
+    i, j = find_collisions(system.positions, system.radii)
+    assert len(i) > 0 and np.bincount(np.concatenate([i, j])).max() > 1  # bodies in several contacts
+    E, p = kinetic_energy(system), system.momentum()
+    bounce(system, i, j)
+    assert np.isclose(kinetic_energy(system), E, rtol=1e-12)
+    assert np.allclose(system.momentum(), p, rtol=0, atol=1e-12 * np.abs(system.masses[:, None] * system.velocities).sum())
+    n = system.positions[j] - system.positions[i]
+    assert (((system.velocities[j] - system.velocities[i]) * n).sum(axis=1) >= 0).all()
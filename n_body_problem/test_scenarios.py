@@ -0,0 +1,18 @@
+import numpy as np
+from scenarios import load_scenario
+
+def test_load_yaml_with_unsigned_exponents(tmp_path):
+    path = tmp_path / 'scenario.yaml'
+    path.write_text("generate:\n"
+                    "  - {scenario: cluster, N: 100, total_mass: 1.0e34, size: 3.0e16, radius: 1e12,\n"
+                    "     position: [-3.0e17, 0], velocity: [2.0e3, 0]}\n"
+                    "bodies:\n"
+                    "  - {position: [3e17, 0], velocity: [0, 1.5e3], mass: 2.0e30, radius: 7.0e8}\n")
+    system = load_scenario(str(path))
+    assert len(system) == 101
+    assert np.isclose(system.masses[:100].sum(), 1.0e34)
+    assert np.allclose(system.radii, [1e12]*100 + [7.0e8])
+    assert np.isclose(system.positions[:100].mean(axis=0)[0], -3.0e17)
+    assert np.allclose(system.positions[100], [3e17, 0])
+    assert np.allclose(system.velocities[100], [0, 1.5e3])
+    assert system.masses[100] == 2.0e30
@@ -0,0 +1,97 @@
+import json
+import os
+import numpy as np
+
+"""
+Trajectory files of headless N-body runs
+
+Positions are stored as one (frames, N, 2) float array
+
+    .npy         preallocated memory mapped array, run parameters in a
+                 <path>.json next to it
+    .h5 / .hdf5  resizable 'positions' dataset plus a 't' dataset, run
+                 parameters as attributes, needs h5py
+
+Both are written frame by frame as the run goes and can be read back
+without loading the whole run (open_trajectory).
+"""
+
+class NpyTrajectory:
+    """ (n_frames, N, 2) .npy memmap, frame times and `meta` in <path>.json """
+
+    def __init__(self, path, n_bodies, n_frames, dtype=np.float64, meta=None):
+        self.path = path
+        self.meta = dict(meta or {})
+        self._positions = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(n_frames, n_bodies, 2))
+        self.t = []
+
+    def write(self, t, positions):
+        self._positions[len(self.t)] = positions
+        self.t.append(t)
+
+    def close(self):
+        self._positions.flush()
+        del self._positions
+        with open(self.path + '.json', 'w') as f:
+            json.dump(dict(self.meta, t=self.t), f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class HDF5Trajectory:
+    """ resizable 'positions' (frames, N, 2) and 't' (frames,) datasets, `meta` as attributes """
+
+    def __init__(self, path, n_bodies, dtype=np.float64, meta=None):
+        import h5py
+        self._file = h5py.File(path, 'w')
+        self._positions = self._file.create_dataset('positions', shape=(0, n_bodies, 2), maxshape=(None, n_bodies, 2),
+                                                    dtype=dtype, chunks=(1, n_bodies, 2))
+        self._t = self._file.create_dataset('t', shape=(0,), maxshape=(None,), dtype=np.float64)
+        self._file.attrs.update(meta or {})
+        self.n_written = 0
+
+    def write(self, t, positions):
+        n = self.n_written
+        self._positions.resize(n + 1, axis=0)
+        self._t.resize(n + 1, axis=0)
+        self._positions[n] = positions
+        self._t[n] = t
+        self.n_written += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_trajectory_writer(path, n_bodies, n_frames, dtype=np.float64, meta=None):
+    """ return a trajectory writer for `path`, chosen by its extension (n_frames only matters for .npy) """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.npy':
+        return NpyTrajectory(path, n_bodies, n_frames, dtype=dtype, meta=meta)
+    if ext in ('.h5', '.hdf5'):
+        return HDF5Trajectory(path, n_bodies, dtype=dtype, meta=meta)
+    raise ValueError(f"don't know how to write a trajectory to '{path}' (use .npy or .h5)")
+
+def open_trajectory(path):
+    """ return (positions, t, meta) of a trajectory file, positions (frames, N, 2) memory mapped / lazily read """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.npy':
+        positions = np.load(path, mmap_mode='r')
+        meta = {}
+        if os.path.exists(path + '.json'):
+            with open(path + '.json') as f:
+                meta = json.load(f)
+        t = np.array(meta.pop('t', np.arange(len(positions))), dtype=np.float64)
+        return positions, t, meta
+    if ext in ('.h5', '.hdf5'):
+        import h5py
+        f = h5py.File(path, 'r')
+        return f['positions'], f['t'][()], dict(f.attrs)
+    raise ValueError(f"don't know how to read a trajectory from '{path}' (use .npy or .h5)")
@@ -0,0 +1,78 @@
+import argparse
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.animation import FuncAnimation
+from trajectory import open_trajectory
+
+"""
+Replay a trajectory written by run.py
+
+    python view.py trajectory.npy --stride 5 --trail 50
+    python view.py trajectory.h5 -o orbits.mp4
+
+Frames are read from the file as they are shown, so runs larger than memory
+replay fine. Bodies removed by a collision merge (NaN in the file) are not
+drawn from then on. With --output the animation is saved (ffmpeg) instead of
+shown.
+"""
+
+def view(path, stride=1, trail=0, interval=20, output=None, fps=30):
+    positions, t, meta = open_trajectory(path)
+    frames = range(0, len(positions), stride)
+
+    # fixed limits from a few frames spread over the run, without the NaN rows of merged-away bodies
+    sample = np.concatenate([np.asarray(positions[i]) for i in np.linspace(0, len(positions) - 1, 16).astype(int)])
+    sample = sample[~np.isnan(sample).any(axis=1)]
+    if len(sample) == 0:
+        raise ValueError(f"{path} has no finite positions to show")
+    lo, hi = np.nanpercentile(sample, [0.5, 99.5], axis=0)
+    half = 0.55 * (hi - lo).max()
+    centre = (lo + hi) / 2
+
+    fig, ax = plt.subplots()
+    ax.set_xlim(centre[0] - half, centre[0] + half)
+    ax.set_ylim(centre[1] - half, centre[1] + half)
+    ax.set_aspect('equal')
+    marker = 'o' if positions.shape[1] <= 100 else ','
+    trails = [ax.plot([], [], '-', lw=0.5, alpha=0.5)[0] for _ in range(positions.shape[1] if 0 < trail else 0)]
+    points, = ax.plot([], [], marker, color='k')
+    label = ax.text(0.02, 0.95, '', transform=ax.transAxes)
+
+    def animate(i):
+        x = np.asarray(positions[i])
+        x = x[~np.isnan(x).any(axis=1)]  # bodies merged away by run.py --collisions merge are NaN
+        points.set_data(x[:, 0], x[:, 1])
+        if trails:
+            past = np.asarray(positions[max(0, i - trail*stride):i + 1:stride])
+            for j, line in enumerate(trails):
+                alive = ~np.isnan(past[:, j]).any(axis=1)
+                line.set_data(past[alive, j, 0], past[alive, j, 1])
+        label.set_text(f"t = {t[i]/86400:.1f} days")
+        return trails + [points, label]
+
+    ani = FuncAnimation(fig, animate, frames=frames, interval=interval, blit=True)
+    if output is not None:
+        ani.save(output, fps=fps)
+    else:
+        plt.show()
+    return len(frames)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="replay an N-body trajectory file")
+    parser.add_argument('trajectory', help="trajectory written by run.py, .npy or .h5")
+    parser.add_argument('--stride', type=int, default=1, help="show every this many frames")
+    parser.add_argument('--trail', type=int, default=0, help="shown frames of trail per body (few bodies only)")
+    parser.add_argument('--interval', type=int, default=20, help="ms between frames")
+    parser.add_argument('-o', '--output', default=None, help="save to this video file instead of showing")
+    parser.add_argument('--fps', type=int, default=30)
+    args = parser.parse_args(argv)
+
+    n_frames = view(args.trajectory, stride=args.stride, trail=args.trail, interval=args.interval,
+                    output=args.output, fps=args.fps)
+    if args.output is not None:
+        print(f"[INFO]: wrote {n_frames} frames to {args.output}")
+
+    return 0
+
+if __name__ == "__main__":
+    main()